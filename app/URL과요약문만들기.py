@@ -4,18 +4,21 @@ from dotenv import load_dotenv
 import requests
 import os
 import json
-from playwright.sync_api import TimeoutError as PWTimeout
-import sys
-import asyncio
-from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
 import isodate
-from openai import OpenAI
 env_path = Path(__file__).resolve().parent / ".env"
 load_dotenv(dotenv_path=env_path)
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")  # .env에서 불러오기
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # .env에서 불러오기
 
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+# OpenAI 클라이언트는 요약이 실제로 필요할 때 생성 (import 비용을 시작 시점에서 제외)
+_openai_client = None
+
+def _get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+        _openai_client = OpenAI(api_key=OPENAI_API_KEY)
+    return _openai_client
 
 from datetime import datetime
 
@@ -246,7 +249,7 @@ def summarize_content(content):
                 + "- JSON 외의 다른 텍스트는 절대 출력하지 마."
         )
 
-        completion = openai_client.chat.completions.create(
+        completion = _get_openai_client().chat.completions.create(
             model="gpt-4.1-mini",
             messages=[
                 {"role": "user", "content": prompt}
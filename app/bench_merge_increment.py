@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+IncrementalStore.merge_increment 마이크로 벤치마크 (Redis/Bybit 호출 없음)
+
+실행:
+    python bench_merge_increment.py
+    BENCH_KEEP=10080 BENCH_ROUNDS=200 python bench_merge_increment.py
+
+비교 대상:
+- legacy : 기존 구현(버퍼 전체 dict화 → 정렬 → 재구성)
+- tail   : 현재 구현(BarRing 컬럼 버퍼, 가장 오래된 새 봉 위치 이후 꼬리만 다시 씀)
+시나리오:
+- append      : 매분 닫힌 봉 1개 추가 (운영 기본 경로)
+- correction  : 마지막 5개 봉 정정 + 새 봉 1개
+- backfill    : 중간 100개 봉 재수집(과거 정정)
+"""
+
+import os
+import time
+from collections import deque
+from typing import Dict, List
+
+os.environ.setdefault("REDIS_PORT", "6379")  # redis_client import용 (연결은 하지 않음)
+
+from coin_backfill import IncrementalStore, KEEP_1M
+from kline_ring import BarRing
+
+KEEP = int(os.getenv("BENCH_KEEP", str(KEEP_1M)))
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "200"))
+STEP_SEC = 60
+
+
+def make_bar(t: int, px: float = 100.0) -> Dict:
+    return {"time": t, "open": px, "high": px + 1, "low": px - 1, "close": px}
+
+
+def legacy_merge(dq: deque, keep: int, new_bars: List[Dict]):
+    by_time = {int(b["time"]): b for b in dq}
+    for nb in new_bars:
+        by_time[int(nb["time"])] = nb
+    merged = sorted(by_time.values(), key=lambda x: x["time"])[-keep:]
+    dq.clear()
+    dq.extend(merged)
+
+
+def scenario_batches():
+    """라운드별 new_bars 생성기: (이름, 라운드 번호 → new_bars)"""
+    def append(i, last_t):
+        return [make_bar(last_t + STEP_SEC, 101.0)]
+
+    def correction(i, last_t):
+        fixed = [make_bar(last_t - k * STEP_SEC, 102.0) for k in range(4, -1, -1)]
+        return fixed + [make_bar(last_t + STEP_SEC, 103.0)]
+
+    def backfill(i, last_t):
+        mid = last_t - (KEEP // 2) * STEP_SEC
+        return [make_bar(mid + k * STEP_SEC, 104.0) for k in range(100)]
+
+    return [("append", append), ("correction", correction), ("backfill", backfill)]
+
+
+def run(make_batch, merge_fn, dq):
+    elapsed = 0.0
+    for i in range(ROUNDS):
+        batch = make_batch(i, int(dq[-1]["time"]))
+        t0 = time.perf_counter()
+        merge_fn(dq, batch)
+        elapsed += time.perf_counter() - t0
+    return dq, elapsed
+
+
+def main():
+    start_t = 1_700_000_000 - KEEP * STEP_SEC
+    seed = [make_bar(start_t + k * STEP_SEC) for k in range(KEEP)]
+
+    store = IncrementalStore(keep_map={"1": KEEP})
+
+    def tail_merge(ring, batch):
+        store.buf[("1", "BENCH")] = ring
+        store.merge_increment("1", "BENCH", batch)
+
+    print(f"KEEP={KEEP} ROUNDS={ROUNDS}")
+    print(f"{'scenario':<12}{'legacy(us/op)':>16}{'tail(us/op)':>14}{'speedup':>10}  same")
+    for name, make_batch in scenario_batches():
+        dq_legacy, t_legacy = run(make_batch, lambda dq, b: legacy_merge(dq, KEEP, b), deque(seed, maxlen=KEEP))
+        ring, t_tail = run(make_batch, tail_merge, BarRing(KEEP, seed))
+        same = list(dq_legacy) == ring.to_bars()
+        us_legacy = t_legacy / ROUNDS * 1e6
+        us_tail = t_tail / ROUNDS * 1e6
+        print(f"{name:<12}{us_legacy:>16.1f}{us_tail:>14.1f}{us_legacy / us_tail:>9.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
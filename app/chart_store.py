@@ -0,0 +1,213 @@
+# chart_store.py
+# chart_data 저장 레이아웃 (종목별 필드 + 내용 digest)
+#
+#   chart_data:{category}   (hash)
+#     {name}              → {"processed_time": ..., "data": [...]} JSON
+#     {name}:digest       → data 부분의 sha1 (processed_time 제외)
+#     {name}:synced_at    → 마지막으로 KIS에서 동기화한 시각 (변경 없어도 갱신, 휴장 판단용)
+#     processed_time      → 카테고리 마지막 저장 시각 (UTC)
+#
+# - 수집 결과 중 digest가 바뀐 종목만 HSET
+# - 종목 데이터/digest/processed_time을 파이프라인 한 번으로 전송
+# - 읽는 쪽은 HGET chart_data:{category} {name} 으로 한 종목만 가져올 수 있음
+# - CHART_LEGACY_BLOB=1 이면 기존 소비자용 chart_data {category} 통짜 JSON도 함께 갱신
+# - CHART_ENCODING=columnar 이면 종목 필드를 컬럼 형식으로 저장 (아래 encode_columnar 참고)
+import os
+import json
+import hashlib
+from datetime import datetime, date
+
+from redis_client import redis_client
+from indicators import MA_KEY, ENVELOPES
+
+LEGACY_KEY = "chart_data"
+CHART_LEGACY_BLOB = os.getenv("CHART_LEGACY_BLOB", "1") == "1"
+CHART_ENCODING = os.getenv("CHART_ENCODING", "rows")  # rows | columnar
+
+DIGEST_SUFFIX = ":digest"
+SYNCED_AT_SUFFIX = ":synced_at"
+PROCESSED_TIME_FIELD = "processed_time"
+
+
+def category_key(category):
+    return f"{LEGACY_KEY}:{category}"
+
+
+def digest_of(entry):
+    """종목 데이터의 내용 digest (매 실행 바뀌는 processed_time은 제외)"""
+    body = json.dumps(entry.get("data"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+
+def _decode(v):
+    return v.decode() if isinstance(v, (bytes, bytearray)) else v
+
+
+# ───────────────────────────────────────────────────────────
+# 컬럼 형식 인코딩
+#   {"processed_time": ..., "format": "columnar-v1",
+#    "columns": ["date", "open", ..., "ma100"], "values": [[...], [...], ...]}
+#   - date는 1970-01-01 기준 일수(int)
+#   - envelope 값은 ma100에서 계산 가능하므로 저장하지 않음
+# ───────────────────────────────────────────────────────────
+COLUMNAR_FORMAT = "columnar-v1"
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _envelope_values(ma):
+    out = {}
+    for name, pct in ENVELOPES.items():
+        out[f"{name}_upper"] = ma * (1 + pct)
+        out[f"{name}_lower"] = ma * (1 - pct)
+    return out
+
+
+def _envelopes_derivable(rows):
+    for row in rows:
+        if MA_KEY not in row:
+            return False
+        for k, v in _envelope_values(row[MA_KEY]).items():
+            if k in row and not (row[k] == v or (row[k] != row[k] and v != v)):  # NaN == NaN 취급
+                return False
+    return True
+
+
+def encode_columnar(entry):
+    rows = entry.get("data") or []
+    if not rows:
+        return {"processed_time": entry.get("processed_time"), "format": COLUMNAR_FORMAT, "columns": [], "values": []}
+
+    derived = set(_envelope_values(0.0)) if _envelopes_derivable(rows) else set()
+    columns = [k for k in rows[0] if k not in derived]
+    values = []
+    for k in columns:
+        if k == "date":
+            values.append([date.fromisoformat(r["date"]).toordinal() - EPOCH_ORDINAL for r in rows])
+        else:
+            values.append([r.get(k) for r in rows])
+    return {"processed_time": entry.get("processed_time"), "format": COLUMNAR_FORMAT, "columns": columns, "values": values}
+
+
+def decode_entry(entry):
+    """컬럼 형식이면 기존 행(dict 리스트) 형식으로 복원, 아니면 그대로 반환"""
+    if not isinstance(entry, dict) or entry.get("format") != COLUMNAR_FORMAT:
+        return entry
+
+    columns = entry["columns"]
+    values = entry["values"]
+    derive_envelopes = MA_KEY in columns and "envelope10_upper" not in columns
+    rows = []
+    for i in range(len(values[0]) if values else 0):
+        row = {}
+        for k, col in zip(columns, values):
+            if k == "date":
+                row["date"] = date.fromordinal(col[i] + EPOCH_ORDINAL).isoformat()
+            else:
+                row[k] = col[i]
+            if k == MA_KEY and derive_envelopes:
+                row.update(_envelope_values(col[i]))
+        rows.append(row)
+    return {"processed_time": entry.get("processed_time"), "data": rows}
+
+
+def encode_entry(entry):
+    if CHART_ENCODING == "columnar":
+        return encode_columnar(entry)
+    return entry
+
+
+def load_symbol(category, name):
+    """한 종목만 조회 (없으면 None)"""
+    raw = redis_client.hget(category_key(category), name)
+    return decode_entry(json.loads(_decode(raw))) if raw else None
+
+
+def load_category(category):
+    """
+    카테고리 전체 종목 조회 → {name: entry}
+    종목별 레이아웃이 아직 없으면(이전 버전 데이터) 기존 통짜 JSON에서 읽음
+    """
+    raw = redis_client.hgetall(category_key(category))
+    out = {}
+    for k, v in raw.items():
+        field = _decode(k)
+        if field == PROCESSED_TIME_FIELD or field.endswith((DIGEST_SUFFIX, SYNCED_AT_SUFFIX)):
+            continue
+        out[field] = decode_entry(json.loads(_decode(v)))
+    if out:
+        return out
+
+    legacy_raw = redis_client.hget(LEGACY_KEY, category)
+    return json.loads(_decode(legacy_raw)) if legacy_raw else {}
+
+
+def load_sync_times(category, names):
+    """{name: 마지막 동기화 시각 문자열 또는 None}"""
+    names = list(names)
+    if not names:
+        return {}
+    values = redis_client.hmget(category_key(category), [n + SYNCED_AT_SUFFIX for n in names])
+    return {n: _decode(v) for n, v in zip(names, values)}
+
+
+def store_changed(category, new_entries, stored_entries=None):
+    """
+    digest가 바뀐 종목만 저장하고 바뀐 종목 이름 리스트를 반환.
+    stored_entries: 기존 저장 데이터(load_category 결과). 통짜 JSON이 아직 없을 때 병합 기준으로 사용
+    """
+    if not new_entries:
+        return []
+
+    key = category_key(category)
+    names = list(new_entries)
+    old_digests = redis_client.hmget(key, [n + DIGEST_SUFFIX for n in names])
+
+    synced_at = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+    mapping = {n + SYNCED_AT_SUFFIX: synced_at for n in names}
+    changed = []
+    for name, old in zip(names, old_digests):
+        d = digest_of(new_entries[name])
+        if _decode(old) == d:
+            continue
+        changed.append(name)
+        mapping[name] = json.dumps(encode_entry(new_entries[name]), separators=(",", ":"))
+        mapping[name + DIGEST_SUFFIX] = d
+
+    if not changed:
+        redis_client.hset(key, mapping=mapping)
+        return []
+
+    processed_time = synced_at
+    mapping[PROCESSED_TIME_FIELD] = processed_time
+
+    pipe = redis_client.pipeline()
+    pipe.hset(key, mapping=mapping)
+    if CHART_LEGACY_BLOB:
+        # 같은 카테고리 이름을 쓰는 다른 source(예: overseas/dmr의 index)가 이번 실행에 먼저 저장했을 수 있으므로
+        # 실행 시작 때 읽은 stored_entries가 아니라 저장 직전의 통짜 JSON에 병합
+        legacy_raw = redis_client.hget(LEGACY_KEY, category)
+        merged = json.loads(_decode(legacy_raw)) if legacy_raw else dict(stored_entries or {})
+        merged.update(new_entries)
+        pipe.hset(LEGACY_KEY, mapping={
+            category + "_processed_time": processed_time,
+            category: json.dumps(merged, sort_keys=True),
+        })
+    pipe.execute()
+    return changed
+
+
+# ───────────────────────────────────────────────────────────
+# 파생 지표 계산 상태 (예: DXY 증분 계산)
+#   chart_state:{name} → JSON
+# ───────────────────────────────────────────────────────────
+def state_key(name):
+    return f"chart_state:{name}"
+
+
+def load_state(name):
+    raw = redis_client.get(state_key(name))
+    return json.loads(_decode(raw)) if raw else None
+
+
+def save_state(name, state):
+    redis_client.set(state_key(name), json.dumps(state, separators=(",", ":")))
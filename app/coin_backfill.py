@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 """
-Bybit Kline 증분 폴링 유틸 (WS 없음)
+Bybit Kline 증분 폴링 유틸 (WS 스트리밍 모드는 kline_stream.py)
 - 1분봉/1일봉 "마감 직후" 증분 수집
 - 인터벌별 KEEP 개수 유지 (예: 1분봉 10,080 / 1일봉 1,500)
 - 최초 실행 시 full_initialize()로 닫힌 봉 기준 KEEP만큼 전량 수집 후 HSET 1회
@@ -13,15 +13,23 @@ import os
 import json
 import time
 import logging
-from typing import List, Dict, Deque, Tuple, Optional
-from collections import deque
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Dict, Tuple, Optional
 
+import numpy as np
 import requests
 from tenacity import retry, wait_exponential_jitter, stop_after_attempt, retry_if_exception_type
 from dotenv import load_dotenv
 
 # 프로젝트의 Redis 클라이언트 사용
 from redis_client import redis_client as redis_client
+import kline_codec
+from kline_ring import BarRing
+import kline_agg
+import kline_mmap
+import kline_views
+from rate_limit import AdaptiveBucket
 
 # ───────────────────────────────────────────────────────────
 # 환경 변수 & 상수
@@ -29,10 +37,22 @@ from redis_client import redis_client as redis_client
 
 load_dotenv()
 
+log = logging.getLogger("coin_backfill")
+
 BYBIT_BASE      = os.getenv("BYBIT_BASE", "https://api.bybit.com")
 CATEGORY        = os.getenv("CATEGORY", "linear")             # 보통 'linear'
 LIMIT_PER_CALL  = int(os.getenv("LIMIT_PER_CALL", "1000"))
 
+# 동시 폴링: 심볼별 요청을 스레드 풀로 병렬 전송, 전체 요청률은 BYBIT_MAX_RPS 이하
+# (Bybit 응답의 X-Bapi-Limit-Status / X-Bapi-Limit-Reset-Timestamp 헤더가 있으면 남은 한도에 맞춰 감속)
+BYBIT_POLL_WORKERS = int(os.getenv("BYBIT_POLL_WORKERS", "16"))
+BYBIT_MAX_RPS      = float(os.getenv("BYBIT_MAX_RPS", "100"))
+BYBIT_BURST        = int(os.getenv("BYBIT_BURST", "10"))
+
+# 범위 수집(백필) 페이지 동시 요청: 페이지 구간을 미리 나눠 병렬로 받음 (0이면 기존 순차 역방향 페이지네이션)
+BYBIT_PARALLEL_PAGES = os.getenv("BYBIT_PARALLEL_PAGES", "1") == "1"
+BYBIT_PAGE_WORKERS   = int(os.getenv("BYBIT_PAGE_WORKERS", "4"))
+
 # 정확한 캔들 마감 반영을 위한 소폭 지연(테스트/스케줄에서 사용)
 SKEW_MS_1M      = int(os.getenv("SKEW_MS_1M", "1500"))        # 1분 마감 후 1.5초 대기
 SKEW_MS_1D      = int(os.getenv("SKEW_MS_1D", "2000"))        # 1일 마감 후 2초 대기
@@ -42,7 +62,25 @@ KEEP_DEFAULT    = int(os.getenv("KEEP", "300"))
 KEEP_1M         = int(os.getenv("KEEP_1M", str(10080)))
 KEEP_1D         = int(os.getenv("KEEP_1D", str(KEEP_DEFAULT)))
 
-# 압축 저장 옵션: 1이면 zlib+base64로 압축 저장
+# Redis 저장 레이아웃
+#   list: 심볼별 리스트(kline:{interval}:list:{sym})에 새로 닫힌 봉만 RPUSH + LTRIM(keep),
+#         정정된 봉은 LSET. kline:{interval}:json 해시에는 메타(list_ts:{sym} = 리스트 마지막 봉)만 매번 갱신하고
+#         기존 소비자용 전체 스냅샷({sym})은 KLINE_SNAPSHOT_EVERY번 플러시마다 1회(0이면 안 씀).
+#         last_ts:{sym}은 스냅샷과 함께만 갱신 → 해시를 직접 읽는 소비자에게 스냅샷 시점을 그대로 알려줌
+#         (최신 데이터는 load_bars로 읽을 것). 집계 인터벌/차트 뷰는 리스트만 씀
+#   hash: 기존 방식(매 플러시마다 심볼별 전체 배열을 해시에 HSET)
+KLINE_LAYOUT         = os.getenv("KLINE_LAYOUT", "list")
+KLINE_SNAPSHOT_EVERY = int(os.getenv("KLINE_SNAPSHOT_EVERY", "60"))
+
+# 갭 보수: 심볼당 한 번에 다시 받을 최대 구간 수 (나머지는 다음 실행에서)
+GAP_REPAIR_MAX_RANGES = int(os.getenv("GAP_REPAIR_MAX_RANGES", "20"))
+
+# 봉 배열 인코딩
+#   json  : 기존 JSON (__schema_version "1")
+#   binary: kline_codec 고정 폭 바이너리, base64 없이 bytes 저장 (__schema_version "2")
+KLINE_CODEC = os.getenv("KLINE_CODEC", "json")
+
+# 압축 저장 옵션: 1이면 zlib+base64로 압축 저장 (binary 코덱에서는 base64 없이 zlib만)
 COMPRESS_JSON = os.getenv("COMPRESS_JSON", "0") == "1"
 if COMPRESS_JSON:
     import zlib, base64
@@ -69,12 +107,65 @@ def loads_compact(s: bytes) -> List[Dict]:
     raw = zlib.decompress(comp)
     return json.loads(raw.decode("utf-8"))
 
+def schema_version() -> str:
+    return str(kline_codec.VERSION) if KLINE_CODEC == "binary" else "1"
+
+def encode_bars(bars):
+    """스냅샷 인코딩 (bars: dict 봉 리스트 또는 BarRing)"""
+    if isinstance(bars, BarRing):
+        if KLINE_CODEC == "binary":
+            return kline_codec.pack_columns(bars.columns(), compress=COMPRESS_JSON)
+        bars = bars.to_bars()
+    if KLINE_CODEC == "binary":
+        return kline_codec.pack_bars(bars, compress=COMPRESS_JSON)
+    return dumps_compact(bars)
+
+def encode_bar(bar: Dict):
+    """리스트 원소(봉 1개) 인코딩. 바이너리는 원소별 압축 이득이 없어 항상 비압축"""
+    if KLINE_CODEC == "binary":
+        return kline_codec.pack_bars([bar])
+    return dumps_compact(bar)
+
+def decode_bars(raw) -> List[Dict]:
+    """스냅샷 디코딩 (바이너리/JSON 자동 판별)"""
+    if raw and kline_codec.is_packed(raw):
+        return kline_codec.unpack_bars(raw)
+    return loads_compact(raw)
+
+def decode_list_items(items: List) -> List[Dict]:
+    out: List[Dict] = []
+    for x in items:
+        if kline_codec.is_packed(x):
+            out.extend(kline_codec.unpack_bars(x))
+        else:
+            out.append(loads_compact(x))
+    return out
+
 # ───────────────────────────────────────────────────────────
 # Bybit HTTP
 # ───────────────────────────────────────────────────────────
 
 http = requests.Session()
 http.headers.update({"accept": "application/json"})
+# 폴링 워커 + 페이지 워커가 같은 세션을 쓰므로 둘을 합친 수만큼 커넥션 재사용 (넘치면 urllib3가 커넥션을 버림)
+http.mount("https://", requests.adapters.HTTPAdapter(
+    pool_connections=4, pool_maxsize=BYBIT_POLL_WORKERS + BYBIT_PAGE_WORKERS))
+
+BYBIT_BUCKET = AdaptiveBucket(rate=BYBIT_MAX_RPS, capacity=BYBIT_BURST)
+BYBIT_POOL = ThreadPoolExecutor(max_workers=BYBIT_POLL_WORKERS, thread_name_prefix="bybit")
+# 페이지 요청은 BYBIT_POOL 작업(갭 보수 등) 안에서도 호출되므로 별도 풀 사용 (풀 고갈 교착 방지)
+BYBIT_PAGE_POOL = ThreadPoolExecutor(max_workers=BYBIT_PAGE_WORKERS, thread_name_prefix="bybit-page")
+
+def _observe_limit_headers(headers):
+    """X-Bapi-Limit-Status(남은 요청 수) / X-Bapi-Limit-Reset-Timestamp(ms) → 버킷 감속"""
+    remaining = headers.get("X-Bapi-Limit-Status")
+    reset_ms = headers.get("X-Bapi-Limit-Reset-Timestamp")
+    if remaining is None or reset_ms is None:
+        return
+    try:
+        BYBIT_BUCKET.observe(int(remaining), int(reset_ms) / 1000)
+    except ValueError:
+        pass
 
 class UpstreamRetryError(Exception):
     pass
@@ -84,7 +175,11 @@ def step_ms(interval: str) -> int:
         return 60_000
     if interval == "D":
         return 86_400_000
-    raise ValueError("interval must be '1' or 'D'")
+    if interval in kline_agg.AGG_MINUTES:  # 1분봉에서 집계하는 상위 봉
+        return kline_agg.AGG_MINUTES[interval] * 60_000
+    if interval in kline_views.VIEW_STEP_SEC:  # 1분봉 다운샘플 뷰
+        return kline_views.VIEW_STEP_SEC[interval] * 1000
+    raise ValueError(f"unsupported interval: {interval}")
 
 def floor_cur_bar_start_ms(now_ms: int, interval: str) -> int:
     s = step_ms(interval)
@@ -128,7 +223,9 @@ def fetch_bybit_klines(
     if end_ms is not None:
         params["end"] = str(end_ms)
     url = f"{BYBIT_BASE}/v5/market/kline"
+    BYBIT_BUCKET.acquire()
     resp = http.get(url, params=params, timeout=15)
+    _observe_limit_headers(resp.headers)
     if resp.status_code == 403:
         raise requests.HTTPError(f"403 Forbidden: {resp.text[:200]}")
     if resp.status_code in (429, 500, 502, 503, 504):
@@ -143,6 +240,57 @@ def fetch_bybit_klines(
 def _hash_key(interval: str) -> str:
     return f"kline:{interval}:json"
 
+def _list_key(interval: str, sym: str) -> str:
+    return f"kline:{interval}:list:{sym}"
+
+def load_bars(interval: str, symbols: List[str]) -> Dict[str, List[Dict]]:
+    """
+    호환 리더: 심볼별 전체 봉 배열(오래→최신).
+    리스트 레이아웃이 있으면 그것을, 없으면 kline:{interval}:json 스냅샷을 읽음.
+    """
+    pipe = redis_client.pipeline()
+    for s in symbols:
+        pipe.lrange(_list_key(interval, s), 0, -1)
+    lists = pipe.execute()
+
+    out: Dict[str, List[Dict]] = {}
+    missing: List[str] = []
+    for s, items in zip(symbols, lists):
+        if items:
+            out[s] = decode_list_items(items)
+        else:
+            missing.append(s)
+
+    if missing:
+        raws = redis_client.hmget(_hash_key(interval), missing)
+        for s, raw in zip(missing, raws):
+            out[s] = decode_bars(raw) if raw else []
+    return out
+
+def load_columns(interval: str, sym: str):
+    """
+    봉 dict를 만들지 않고 컬럼 배열({"time","open",...} → numpy)로 읽기.
+    바이너리로 저장된 경우 numpy.frombuffer로 해석, JSON이면 변환해서 반환.
+    """
+    items = redis_client.lrange(_list_key(interval, sym), 0, -1)
+    if items and all(kline_codec.is_packed(x) for x in items):
+        try:
+            return kline_codec.unpack_single_bar_items(items)
+        except ValueError:
+            bars = decode_list_items(items)
+    elif items:
+        bars = decode_list_items(items)
+    else:
+        raw = redis_client.hget(_hash_key(interval), sym)
+        if raw and kline_codec.is_packed(raw):
+            return kline_codec.unpack_columns(raw)
+        bars = loads_compact(raw) if raw else []
+
+    return {
+        c: np.array([b.get(c, np.nan) for b in bars], dtype="<i8" if c == "time" else "<f8")
+        for c in kline_codec.columns_for(0)
+    }
+
 # ───────────────────────────────────────────────────────────
 # 범위 수집(페이지네이션 대용)
 # ───────────────────────────────────────────────────────────
@@ -150,7 +298,20 @@ def _hash_key(interval: str) -> str:
 def _advance_ms(interval: str, start_ms: int) -> int:
     return start_ms + step_ms(interval)
 
-def fetch_bybit_klines_range(
+def _dedup_tail(out: List[Dict], want: int) -> List[Dict]:
+    """정렬 + 중복 제거(혹시 일부 겹치는 경우) 후 끝에서 want개"""
+    out.sort(key=lambda b: b["time"])
+    dedup: List[Dict] = []
+    seen = set()
+    for b in out:
+        t = int(b["time"])
+        if t in seen:
+            continue
+        seen.add(t)
+        dedup.append(b)
+    return dedup[-want:]
+
+def _fetch_bybit_pages_serial(
     symbol: str,
     interval: str,
     start_ms: int,
@@ -158,10 +319,8 @@ def fetch_bybit_klines_range(
     want: int,
 ) -> List[Dict]:
     """
-    [start_ms, end_ms] 구간에서 '닫힌 봉' 기준으로 최대 want개 수집.
-    Bybit 단일 호출 limit(기본 1000)를 초과할 경우 여러 번 반복 호출.
-    - 최근(끝)에서 과거(앞)로 역방향 페이지네이션
-    - 각 chunk는 fetch_bybit_klines()에서 오름차순 정렬 보장
+    최근(끝)에서 과거(앞)로 역방향 페이지네이션.
+    다음 페이지의 끝은 직전 chunk의 가장 오래된 봉 기준.
     """
     step = step_ms(interval)
     out: List[Dict] = []
@@ -203,20 +362,56 @@ def fetch_bybit_klines_range(
             break
         cur_end = next_end
 
-    # 정렬 + 중복 제거(혹시 일부 겹치는 경우) 후 끝에서 want개
-    if out:
-        out.sort(key=lambda b: b["time"])
-        dedup: List[Dict] = []
-        seen = set()
-        for b in out:
-            t = int(b["time"])
-            if t in seen:
-                continue
-            seen.add(t)
-            dedup.append(b)
-        return dedup[-want:]
+    return _dedup_tail(out, want) if out else []
 
-    return []
+def plan_bybit_windows(interval: str, start_ms: int, end_ms: int, max_pages: int) -> List[Tuple[int, int]]:
+    """
+    [start_ms, end_ms]를 최신 → 과거 순, 페이지당 봉 LIMIT_PER_CALL개 구간들로 분할.
+    (구간 안의 봉 시작 시각은 최대 LIMIT_PER_CALL개라 한 응답에서 잘리지 않음)
+    """
+    span = LIMIT_PER_CALL * step_ms(interval) - 1  # 구간 [end - span, end] 안의 봉 시작 시각 = LIMIT_PER_CALL개
+    windows: List[Tuple[int, int]] = []
+    cur_end = end_ms
+    while cur_end >= start_ms and len(windows) < max_pages:
+        cur_start = max(start_ms, cur_end - span)
+        windows.append((cur_start, cur_end))
+        cur_end = cur_start - 1
+    return windows
+
+def fetch_bybit_klines_range(
+    symbol: str,
+    interval: str,
+    start_ms: int,
+    end_ms: int,
+    want: int,
+) -> List[Dict]:
+    """
+    [start_ms, end_ms] 구간에서 '닫힌 봉' 기준으로 최대 want개 수집.
+    Bybit 단일 호출 limit(기본 1000)를 초과할 경우 여러 번 호출.
+    - BYBIT_PARALLEL_PAGES=1: 끝에서부터 want개를 덮는 페이지 구간을 미리 나눠 BYBIT_PAGE_POOL에서
+      동시에 요청 (전체 요청률은 BYBIT_BUCKET이 제한), 정렬/중복 제거는 끝에서 한 번.
+      빠진 봉 때문에 모자라면 남은 앞쪽 범위만 순차로 보충
+    - 0 또는 페이지가 하나뿐이면 기존 순차 역방향 페이지네이션
+    """
+    windows = plan_bybit_windows(interval, start_ms, end_ms, max(1, -(-want // LIMIT_PER_CALL)))
+    if not BYBIT_PARALLEL_PAGES or len(windows) <= 1:
+        return _fetch_bybit_pages_serial(symbol, interval, start_ms, end_ms, want)
+
+    futures = [
+        BYBIT_PAGE_POOL.submit(fetch_bybit_klines, symbol, interval, w_start, w_end, LIMIT_PER_CALL)
+        for w_start, w_end in windows
+    ]
+    out: List[Dict] = []
+    for fut in futures:
+        out.extend(b for b in fut.result() if start_ms <= int(b["time"]) * 1000 <= end_ms)
+    out = _dedup_tail(out, want) if out else []
+
+    rest_end = windows[-1][0] - 1
+    if len(out) < want and rest_end >= start_ms:
+        out = _dedup_tail(
+            _fetch_bybit_pages_serial(symbol, interval, start_ms, rest_end, want - len(out)) + out, want
+        )
+    return out
 
 
 # ───────────────────────────────────────────────────────────
@@ -228,11 +423,51 @@ Bar = Dict[str, float]
 class IncrementalStore:
     """
     interval별 keep_map 예: {"1": 10080, "D": 1500}
+    버퍼는 (interval, sym)별 BarRing(컬럼 링 버퍼, 용량=keep)
+    agg_intervals: 1분봉에서 집계할 상위 봉 (예: ["5", "15", "60", "240"]).
+      1분봉 flush 때 바뀐 구간부터 다시 집계해 같은 형식으로 함께 flush
+    view_points: 1분봉 다운샘플 뷰 해상도 (예: [500, 1000] → "1@500", "1@1000").
+      상위 봉과 같은 방식으로 갱신하되 진행 중인 마지막 버킷도 포함
+    스레드 안전: 버퍼/플러시 상태 변경은 내부 RLock 안에서만 (네트워크 수집은 락 밖).
+      columns()/BarRing view는 락 밖에서 읽으므로 다음 병합 전에 사용을 끝낼 것
     """
-    def __init__(self, keep_map: Dict[str, int]):
-        self.keep_map = keep_map
-        self.buf: Dict[Tuple[str, str], Deque[Bar]] = {}
+    def __init__(
+        self,
+        keep_map: Dict[str, int],
+        agg_intervals: Optional[List[str]] = None,
+        view_points: Optional[List[int]] = None,
+    ):
+        self.keep_map = dict(keep_map)
+        self.agg_intervals = list(agg_intervals or [])
+        # 1분봉에서 파생되는 인터벌 → (버킷 폭 초, 진행 중 버킷 포함 여부)
+        self._derived: Dict[str, Tuple[int, bool]] = {}
+        base_keep = self.keep_map.get(kline_agg.BASE_INTERVAL)
+        if base_keep:
+            for iv, keep in kline_agg.agg_keep_map(base_keep, self.agg_intervals).items():
+                self.keep_map.setdefault(iv, keep)
+                self._derived[iv] = (kline_agg.interval_step_sec(iv), False)
+            for iv, keep in kline_views.view_keep_map(base_keep, list(view_points or [])).items():
+                self.keep_map.setdefault(iv, keep)
+                self._derived[iv] = (kline_views.VIEW_STEP_SEC[iv], True)
+        # 심볼별 다시 집계할 1분봉 시작 time (0이면 버퍼 전체)
+        self._agg_since: Dict[str, int] = {}
+        self.buf: Dict[Tuple[str, str], BarRing] = {}
         self.log = logging.getLogger("IncrementalStore")
+        # list 레이아웃용: 마지막 플러시 이후 바뀐 봉 time / 전체 재작성 필요 여부
+        self._dirty: Dict[Tuple[str, str], Dict] = {}
+        # Redis 리스트에 반영된 마지막 봉 time (없으면 다음 플러시에서 전체 재작성)
+        self._flushed_ts: Dict[Tuple[str, str], Optional[int]] = {}
+        self._flush_count: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        # 파이프라인 전송은 self._lock 밖. 같은 인터벌 전송은 만든 순서대로(LSET 인덱스가 앞 전송에 의존)
+        self._send_locks: Dict[str, threading.Lock] = {}
+        # 전송 실패한 {인터벌: 심볼} → 다음 flush 때 리스트 전체 재작성 (전송 스레드는 self._lock을 잡지 않음)
+        self._failed_sends: Dict[str, set] = {}
+        self._failed_lock = threading.Lock()
+        # 로컬 스냅샷 순번 (늦게 끝난 이전 스냅샷이 새 파일을 덮지 않도록)
+        self._snap_seq: Dict[str, int] = {}
+        self._snap_written: Dict[str, int] = {}
+        self._snap_locks: Dict[str, threading.Lock] = {}
 
     def keep_for(self, interval: str) -> int:
         if interval in self.keep_map:
@@ -242,17 +477,32 @@ class IncrementalStore:
     def _k(self, interval: str, sym: str) -> Tuple[str, str]:
         return (interval, sym)
 
-    def ensure(self, interval: str, sym: str) -> Deque[Bar]:
+    def ensure(self, interval: str, sym: str) -> BarRing:
         k = self._k(interval, sym)
         need = self.keep_for(interval)
-        dq = self.buf.get(k)
-        if dq is None or dq.maxlen != need:
-            newdq: Deque[Bar] = deque(maxlen=need)
-            if dq:
-                newdq.extend(list(dq)[-need:])
-            self.buf[k] = newdq
-            dq = newdq
-        return dq
+        with self._lock:
+            dq = self.buf.get(k)
+            if dq is None or dq.maxlen != need:
+                newdq = BarRing(need)
+                if dq:
+                    newdq.extend(dq.to_bars(max(0, len(dq) - need)))
+                self.buf[k] = newdq
+                dq = newdq
+            return dq
+
+    def columns(self, interval: str, sym: str):
+        """지표 계산용 컬럼 view {"time","open","high","low","close"} (복사 없음, 다음 병합 전까지 유효)"""
+        with self._lock:
+            return self.ensure(interval, sym).columns()
+
+    def _replace(self, interval: str, sym: str, bars: List[Bar]) -> int:
+        """버퍼를 bars로 교체 (다음 flush에서 전체 재작성)"""
+        with self._lock:
+            dq = self.ensure(interval, sym)
+            dq.clear()
+            dq.extend(bars[-self.keep_for(interval):])
+            self._mark_rewrite(interval, sym)
+            return len(dq)
 
     # ── 최초 실행: 설정 KEEP으로 '닫힌 봉' 기준 전량 수집 후 즉시 플러시
     def full_initialize(self, symbols: List[str], interval: str, exclude_open: bool = True):
@@ -263,81 +513,317 @@ class IncrementalStore:
 
         for sym in symbols:
             bars = fetch_bybit_klines_range(sym, interval, start_ms, end_ms, want=keep)
-            dq = self.ensure(interval, sym)
-            dq.clear()
-            for b in bars[-keep:]:
-                dq.append(b)
-            self.log.info("Full-initialized %s/%s -> len=%d (keep=%d)", interval, sym, len(dq), keep)
+            n = self._replace(interval, sym, bars)
+            self.log.info("Full-initialized %s/%s -> len=%d (keep=%d)", interval, sym, n, keep)
 
         self.flush_interval(interval, symbols)
 
-    # ── 기존 스냅샷 기반 로드(옵션): 길이 다르면 강제 백필해서 맞춤
-    def load_or_backfill(self, symbols: List[str], interval: str):
-        hkey = _hash_key(interval)
-        pipe = redis_client.pipeline()
-        for s in symbols:
-            pipe.hget(hkey, s)
-        raw_list = pipe.execute()
-
+    # ── 기존 스냅샷 기반 로드: 저장된 봉은 재사용하고 빠진 꼬리(필요하면 앞쪽)만 수집
+    def load_or_backfill(self, symbols: List[str], interval: str) -> Dict[str, Dict[str, int]]:
+        """
+        - 저장분: 로컬 mmap 스냅샷(kline_mmap) → 없는 심볼만 Redis(load_bars)
+        - 저장된 봉 중 keep 윈도우 안의 닫힌 봉은 그대로 재사용
+        - 꼬리: 저장된 마지막 봉 이후 ~ 마지막 닫힌 봉 (compute_fetch_window)
+        - 앞쪽: 그래도 keep개가 안 될 때만 윈도우 시작 ~ 저장된 첫 봉 이전
+        - 저장분이 없거나 윈도우보다 오래됐으면 결국 윈도우 전체 수집
+        반환: {sym: {"reused": 재사용 봉 수, "fetched": 새로 받은 봉 수, "source": local|redis|none}}
+        """
         now_ms = int(time.time() * 1000)
         keep = self.keep_for(interval)
+        step = step_ms(interval)
         end_ms = floor_cur_bar_start_ms(now_ms, interval) - 1
         start_ms = window_start_ms(end_ms, interval, keep)
 
-        for s, raw in zip(symbols, raw_list):
-            dq = self.ensure(interval, s)
-            dq.clear()
-
-            needs_full = True
-            if raw:
-                arr = loads_compact(raw)
-                if len(arr) >= keep:
-                    trimmed = arr[-keep:]
-                    if len(trimmed) == keep:
-                        for b in trimmed:
-                            dq.append(b)
-                        needs_full = False
-
-            if needs_full:
-                bars = fetch_bybit_klines_range(s, interval, start_ms, end_ms, want=keep)
-                for b in bars[-keep:]:
-                    dq.append(b)
+        # 1) 저장분을 링 버퍼에 채움
+        sources: Dict[str, str] = {}
+        snap = kline_mmap.open_snapshot(interval)
+        if snap is not None:
+            with snap:
+                for s in symbols:
+                    cols = snap.columns(s)
+                    if cols is None:
+                        continue
+                    t = cols["time"] * 1000
+                    lo, hi = int(np.searchsorted(t, start_ms)), int(np.searchsorted(t, end_ms, side="right"))
+                    if hi > lo:  # 윈도우 안 봉이 없으면(오래된 스냅샷) Redis부터 확인
+                        self._replace_columns(interval, s, {c: a[lo:hi] for c, a in cols.items()})
+                        sources[s] = "local"
+                    del cols, t
+            self._resume_flushed([s for s in symbols if sources.get(s) == "local"], interval)
+
+        rest = [s for s in symbols if s not in sources]
+        if rest:
+            try:
+                stored = load_bars(interval, rest)
+            except Exception:
+                self.log.warning("Redis kline 스냅샷 읽기 실패 → Bybit에서 수집", exc_info=True)
+                stored = {}
+            for s in rest:
+                bars = [b for b in stored.get(s) or [] if start_ms <= int(b["time"]) * 1000 <= end_ms]
+                self._replace(interval, s, bars)
+                sources[s] = "redis" if bars else "none"
+
+        # 2) 꼬리 / 앞쪽 수집 (네트워크는 락 밖)
+        report: Dict[str, Dict[str, int]] = {}
+        for s in symbols:
+            reused = len(self.ensure(interval, s))
+            fetched = 0
+
+            last = self.last_ts(interval, s)
+            tail_start, tail_end = compute_fetch_window(last, interval, now_ms, keep, exclude_open=True)
+            if tail_start is not None:
+                tail_start = max(tail_start, start_ms)
+                want = min(keep, (tail_end - tail_start) // step + 1)
+                tail = fetch_bybit_klines_range(s, interval, tail_start, tail_end, want=want)
+                self.merge_increment(interval, s, tail)
+                fetched += len(tail)
+
+            with self._lock:
+                dq = self.ensure(interval, s)
+                head_end = int(dq.times()[0]) * 1000 - 1 if dq else None
+                missing = keep - len(dq)
+            if missing > 0 and head_end is not None and head_end >= start_ms:
+                head = fetch_bybit_klines_range(s, interval, start_ms, head_end, want=missing)
+                self.merge_increment(interval, s, head)
+                fetched += len(head)
+
+            n = len(self.ensure(interval, s))
+            report[s] = {"reused": reused, "fetched": fetched, "source": sources[s]}
+            self.log.info(
+                "Initialized %s/%s => len=%d (keep=%d, source=%s, reused=%d, fetched=%d)",
+                interval, s, n, keep, sources[s], reused, fetched,
+            )
 
+        if report:
             self.log.info(
-                "Initialized %s/%s => len=%d (keep=%d, source=%s)",
-                interval, s, len(dq), keep,
-                "redis" if not needs_full else "full_backfill",
+                "Warm start %s: symbols=%d reused=%d fetched=%d (local=%d)",
+                interval, len(report),
+                sum(r["reused"] for r in report.values()), sum(r["fetched"] for r in report.values()),
+                sum(1 for r in report.values() if r["source"] == "local"),
             )
+        return report
+
+    def _replace_columns(self, interval: str, sym: str, cols: Dict) -> int:
+        with self._lock:
+            dq = self.ensure(interval, sym)
+            dq.clear()
+            dq.extend_columns({c: a[-self.keep_for(interval):] for c, a in cols.items()})
+            self._mark_rewrite(interval, sym)
+            return len(dq)
+
+    def _resume_flushed(self, symbols: List[str], interval: str):
+        """
+        로컬 스냅샷에서 올린 심볼 중 Redis의 list_ts:{sym}(이전 버전이 쓴 해시는 last_ts:{sym})이 스냅샷 마지막 봉과 같으면
+        Redis 리스트가 이미 그 시점까지 반영된 것으로 보고 전체 재작성 대신 이후 변경분만 flush.
+        """
+        if not symbols or KLINE_LAYOUT != "list":
+            return
+        try:
+            fields = [f"list_ts:{s}" for s in symbols] + [f"last_ts:{s}" for s in symbols]
+            values = redis_client.hmget(_hash_key(interval), fields)
+        except Exception:
+            return
+        remote = [lt if lt is not None else old for lt, old in zip(values[:len(symbols)], values[len(symbols):])]
+        with self._lock:
+            for s, raw in zip(symbols, remote):
+                last = self.ensure(interval, s).last_time()
+                if raw is None or last is None or int(raw) != last:
+                    continue
+                k = self._k(interval, s)
+                self._dirty[k] = {"rewrite": False, "times": set()}
+                self._flushed_ts[k] = last
 
     def last_ts(self, interval: str, sym: str) -> Optional[int]:
-        dq = self.ensure(interval, sym)
-        return int(dq[-1]["time"]) if dq else None
+        with self._lock:
+            return self.ensure(interval, sym).last_time()
+
+    def find_gaps(self, interval: str, sym: str) -> List[Tuple[int, int]]:
+        """
+        버퍼 안쪽의 빠진 봉 구간 [(첫 빠진 time, 마지막 빠진 time)] (초 단위, 양끝 포함).
+        버퍼 앞쪽(보관 범위 이전)과 마지막 봉 이후(다음 폴링 대상)는 갭으로 보지 않음.
+        """
+        with self._lock:
+            t = self.ensure(interval, sym).times().copy()
+        if len(t) < 2:
+            return []
+        step = step_ms(interval) // 1000
+        idx = np.nonzero(np.diff(t) > step)[0]
+        return [(int(t[i]) + step, int(t[i + 1]) - step) for i in idx]
 
     def merge_increment(self, interval: str, sym: str, new_bars: List[Bar]):
-        """증분 데이터 병합(동일 time은 덮어써 확정치 반영)."""
+        """
+        증분 데이터 병합(동일 time은 덮어써 확정치 반영).
+        버퍼는 time 오름차순이므로 '가장 오래된 새 봉' 위치(searchsorted) 이후 꼬리만
+        다시 씀 → 보통 O(새 봉 수). 과거 봉 정정도 같은 경로로 덮어씀.
+        용량(keep)을 넘치는 앞쪽은 링 버퍼가 버림.
+        """
         if not new_bars:
             return
-        dq = self.ensure(interval, sym)
-        keep = self.keep_for(interval)
-        by_time = {int(b["time"]): b for b in dq}
-        for nb in new_bars:
-            by_time[int(nb["time"])] = nb
-        merged = sorted(by_time.values(), key=lambda x: x["time"])[-keep:]
-        dq.clear()
-        dq.extend(merged)
+        incoming = {int(nb["time"]) for nb in new_bars}
+        with self._lock:
+            inserted = self.ensure(interval, sym).merge(new_bars)
+            dirty = self._dirty.setdefault(self._k(interval, sym), {"rewrite": False, "times": set()})
+            dirty["times"].update(incoming)
+            self._note_agg(interval, sym, min(incoming))
+            if inserted:
+                # 기존 봉 사이에 끼워 넣은 경우(갭 보충 등) 리스트 인덱스가 밀리므로 전체 재작성
+                dirty["rewrite"] = True
+
+    def _mark_rewrite(self, interval: str, sym: str):
+        self._dirty[self._k(interval, sym)] = {"rewrite": True, "times": set()}
+        self._note_agg(interval, sym, 0)
+
+    def _note_agg(self, interval: str, sym: str, since: int):
+        if interval == kline_agg.BASE_INTERVAL and self._derived:
+            self._agg_since[sym] = min(since, self._agg_since.get(sym, since))
+
+    def _update_aggregates(self, symbols: List[str]) -> List[str]:
+        """바뀐 1분봉이 속한 버킷부터 상위 봉/뷰 재집계 → 병합. 반환: 갱신된 심볼"""
+        touched = []
+        for sym in symbols:
+            since = self._agg_since.pop(sym, None)
+            if since is None:
+                continue
+            base = self.ensure(kline_agg.BASE_INTERVAL, sym)
+            if not base:
+                continue
+            first_time = int(base.times()[0])
+            for iv, (step_sec, partial) in self._derived.items():
+                start = base.index_of(kline_agg.bucket_start(since, step_sec))
+                cols = {c: a[start:] for c, a in base.columns().items()}
+                bars = kline_agg.aggregate(cols, step_sec, first_time, include_partial=partial)
+                if since == 0:
+                    self.ensure(iv, sym).clear()
+                    self._mark_rewrite(iv, sym)
+                self.merge_increment(iv, sym, bars)
+            touched.append(sym)
+        return touched
+
+    def _queue_list_update(self, pipe, interval: str, sym: str, dq: BarRing):
+        """list 레이아웃: 마지막 플러시 이후 바뀐 봉만 LSET/RPUSH (필요 시 전체 재작성)"""
+        k = self._k(interval, sym)
+        key = _list_key(interval, sym)
+        dirty = self._dirty.pop(k, None)
+        redis_last = self._flushed_ts.get(k)
+        self._flushed_ts[k] = dq.last_time()
+
+        if redis_last is None or (dirty and dirty["rewrite"]):
+            pipe.delete(key)
+            if dq:
+                pipe.rpush(key, *[encode_bar(b) for b in dq])
+            return
+        if not dirty:
+            return
+
+        # redis_last 이후 봉은 추가 대상, 이전 봉 중 바뀐 것은 뒤에서 몇 번째인지로 LSET
+        # (Redis 리스트 꼬리 = 버퍼의 redis_last 위치)
+        n_flushed = dq.index_of(redis_last + 1)
+        for t in dirty["times"]:
+            if t > redis_last:
+                continue
+            i = dq.index_of(t)
+            if i < n_flushed and dq.times()[i] == t:
+                pipe.lset(key, i - n_flushed, encode_bar(dq[i]))
+
+        if n_flushed < len(dq):
+            pipe.rpush(key, *[encode_bar(b) for b in dq.to_bars(n_flushed)])
+            pipe.ltrim(key, -self.keep_for(interval), -1)
 
     def flush_interval(self, interval: str, symbols: List[str]):
-        """인터벌별로 Redis HSET 1회(스냅샷 저장)."""
+        """
+        인터벌별 Redis 반영(파이프라인 1회).
+        - list 레이아웃: 새로 닫힌/정정된 봉만 전송, 전체 스냅샷은 KLINE_SNAPSHOT_EVERY번마다 (수집 인터벌만)
+        - hash 레이아웃: 매번 심볼별 전체 스냅샷 HSET
+        전송 실패 시 실패한 인터벌(집계 인터벌 포함)의 해당 심볼들은 다음 flush에서 리스트 전체 재작성.
+        파이프라인 구성/dirty 정리는 락 안, Redis 전송은 락 밖 (다른 인터벌 수집이 왕복을 기다리지 않음)
+        """
+        with self._lock:
+            self._apply_failed_sends()
+            batches = self._flush_interval(interval, symbols)
+            # 락을 놓기 전에 인터벌별 전송 순서를 확보 (이 락들을 가진 동안에는 self._lock을 잡지 않음)
+            for iv, _, _ in batches:
+                self._send_locks.setdefault(iv, threading.Lock()).acquire()
+            payloads = [self._local_snapshot_payload(iv) for iv, _, _ in batches] if kline_mmap.KLINE_LOCAL_SNAPSHOT else []
+
+        error = None
+        try:
+            for iv, syms, pipe in batches:
+                try:
+                    pipe.execute()
+                except Exception as e:
+                    # dirty/flushed_ts는 이미 넘겼으므로 Redis 리스트 상태를 알 수 없음 → 다음 flush에서 전체 재작성
+                    with self._failed_lock:
+                        self._failed_sends.setdefault(iv, set()).update(syms)
+                    error = error or e
+        finally:
+            for iv, _, _ in batches:
+                self._send_locks[iv].release()
+        if error is not None:
+            raise error
+
+        # 로컬 스냅샷 파일 쓰기는 락 밖 (스냅샷 순번이 더 새로운 것만 기록)
+        for iv, seq, payload in payloads:
+            with self._snap_locks.setdefault(iv, threading.Lock()):
+                if seq <= self._snap_written.get(iv, 0):
+                    continue
+                try:
+                    kline_mmap.write_snapshot(iv, payload)
+                    self._snap_written[iv] = seq
+                except Exception:
+                    self.log.warning("로컬 kline 스냅샷 쓰기 실패 (%s)", iv, exc_info=True)
+
+    def _local_snapshot_payload(self, interval: str):
+        """(interval, 순번, {sym: 컬럼 복사본}) — 인터벌의 모든 심볼 (락 안에서 호출)"""
+        seq = self._snap_seq.get(interval, 0) + 1
+        self._snap_seq[interval] = seq
+        payload = {
+            sym: {c: a.copy() for c, a in ring.columns().items()}
+            for (iv, sym), ring in self.buf.items() if iv == interval
+        }
+        return interval, seq, payload
+
+    def _apply_failed_sends(self):
+        """(락 안) 전송 실패한 인터벌/심볼의 flushed_ts를 지워 전체 재작성되게 함"""
+        with self._failed_lock:
+            failed, self._failed_sends = self._failed_sends, {}
+        for iv, syms in failed.items():
+            for s in syms:
+                self._flushed_ts.pop(self._k(iv, s), None)
+
+    def _flush_interval(self, interval: str, symbols: List[str]) -> List[Tuple[str, List[str], Any]]:
+        """(락 안) 파이프라인 구성. 반환: [(인터벌, 심볼들, 파이프라인)] (1분봉이면 집계 인터벌 포함)"""
+        aggregated = self._update_aggregates(symbols) if interval == kline_agg.BASE_INTERVAL else []
+
+        n = self._flush_count.get(interval, 0) + 1
+        self._flush_count[interval] = n
+        use_list = KLINE_LAYOUT == "list"
+        # 집계 인터벌/차트 뷰는 기존 해시 소비자가 없으므로 list 레이아웃에서는 리스트만
+        snapshot = not use_list or (
+            interval not in self._derived
+            and KLINE_SNAPSHOT_EVERY > 0 and (n - 1) % KLINE_SNAPSHOT_EVERY == 0
+        )
+
         mapping = {
-            "__schema_version": "1",
+            "__schema_version": schema_version(),
+            "__layout": KLINE_LAYOUT,
             "__updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
         }
+        pipe = redis_client.pipeline(transaction=False)
         for s in symbols:
             dq = self.ensure(interval, s)
-            arr = list(dq)
-            mapping[s] = dumps_compact(arr)
-            mapping[f"last_ts:{s}"] = str(arr[-1]["time"] if arr else 0)
-        redis_client.hset(_hash_key(interval), mapping=mapping)
+            if snapshot:
+                mapping[s] = encode_bars(dq)
+                mapping[f"last_ts:{s}"] = str(dq.last_time() or 0)
+            if use_list:
+                mapping[f"list_ts:{s}"] = str(dq.last_time() or 0)
+                self._queue_list_update(pipe, interval, s, dq)
+        pipe.hset(_hash_key(interval), mapping=mapping)
+
+        batches = [(interval, list(symbols), pipe)]
+        if aggregated:
+            for iv in self._derived:
+                batches += self._flush_interval(iv, aggregated)
+        return batches
 
 # ───────────────────────────────────────────────────────────
 # 증분 수집 윈도우(열린 봉 제외)
@@ -367,62 +853,141 @@ def compute_fetch_window(
     return start_ms, end_ms
 
 # ───────────────────────────────────────────────────────────
-# 테스트 실행 (__main__) - argparse 없이 ENV만 사용
+# 다중 심볼 동시 폴링
 # ───────────────────────────────────────────────────────────
-def run_klines_minutely(SYMBOLS):
+
+def poll_increments(store: "IncrementalStore", interval: str, symbols: List[str], now_ms: int) -> Dict[str, int]:
+    """
+    심볼별 증분 요청을 BYBIT_POOL에서 병렬 수행 → 스토어 병합은 호출 스레드에서 순서대로 → 인터벌당 플러시 1회.
+    한 심볼 실패는 로그만 남기고 나머지는 반영 (다음 주기에 last_ts부터 다시 수집됨).
+    반환: {"fetched": 요청 수, "bars": 받은 봉 수, "failed": 실패 심볼 수}
+    """
+    keep_for = store.keep_for(interval)
+    windows = {}
+    for sym in symbols:
+        start_ms, end_ms = compute_fetch_window(
+            store.last_ts(interval, sym), interval, now_ms, keep_for, exclude_open=True
+        )
+        if start_ms is not None:  # 가져올 것 없으면 건너뜀
+            windows[sym] = (start_ms, end_ms)
+
+    futures = {
+        sym: BYBIT_POOL.submit(fetch_bybit_klines, sym, interval, start_ms, end_ms, LIMIT_PER_CALL)
+        for sym, (start_ms, end_ms) in windows.items()
+    }
+    stats = {"fetched": len(futures), "bars": 0, "failed": 0}
+    for sym, fut in futures.items():
+        try:
+            bars = fut.result()
+        except Exception as e:
+            stats["failed"] += 1
+            logging.getLogger("IncrementalStore").warning("⚠️ %s/%s 증분 수집 실패: %s", interval, sym, e)
+            continue
+        store.merge_increment(interval, sym, bars)
+        stats["bars"] += len(bars)
+
+    store.flush_interval(interval, symbols)
+    return stats
+
+# ───────────────────────────────────────────────────────────
+# 갭 탐지/보수
+#   kline:{interval}:json 의 gaps:{sym} 필드에 심볼별 결과 JSON 기록
+#   {"found": 구간 수, "missing": 빠진 봉 수, "unfilled": 보수 후에도 남은 구간 수, "checked_at": ...}
+#   (거래소 점검 등으로 원래 봉이 없는 구간은 unfilled로 남음)
+# ───────────────────────────────────────────────────────────
+
+def repair_gaps(store: "IncrementalStore", interval: str, symbols: List[str]) -> Dict[str, Dict]:
+    step = step_ms(interval) // 1000
+    found = {s: store.find_gaps(interval, s) for s in symbols}
+
+    futures = []
+    for sym, gaps in found.items():
+        for start_s, end_s in gaps[:GAP_REPAIR_MAX_RANGES]:
+            want = (end_s - start_s) // step + 1
+            fut = BYBIT_POOL.submit(fetch_bybit_klines_range, sym, interval, start_s * 1000, end_s * 1000, want)
+            futures.append((sym, fut))
+
+    repaired = set()
+    for sym, fut in futures:
+        try:
+            bars = fut.result()
+        except Exception as e:
+            logging.getLogger("IncrementalStore").warning("⚠️ %s/%s 갭 보수 실패: %s", interval, sym, e)
+            continue
+        if bars:
+            store.merge_increment(interval, sym, bars)
+            repaired.add(sym)
+    if repaired:
+        store.flush_interval(interval, sorted(repaired))
+
+    checked_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    report = {}
+    for sym, gaps in found.items():
+        report[sym] = {
+            "found": len(gaps),
+            "missing": sum((e - s) // step + 1 for s, e in gaps),
+            "unfilled": len(store.find_gaps(interval, sym)) if gaps else 0,
+            "checked_at": checked_at,
+        }
+    if report:
+        redis_client.hset(_hash_key(interval), mapping={
+            f"gaps:{sym}": json.dumps(r, separators=(",", ":")) for sym, r in report.items()
+        })
+    return report
+
+# ───────────────────────────────────────────────────────────
+# 주기 작업 진입점 (kline_worker / __main__ 테스트에서 사용)
+# ───────────────────────────────────────────────────────────
+def run_gap_repair(store: IncrementalStore, SYMBOLS, interval: str = "1"):
     if not SYMBOLS:
-        log.warning("⏭️ SYMBOLS 비어 있음. 1m kline 작업 스킵")
         return
     t0 = time.perf_counter()
     try:
-        now_ms = int(time.time() * 1000) + SKEW_MS_1M
-        keep_for = store.keep_for("1")
+        report = repair_gaps(store, interval, SYMBOLS)
+        dt_ms = (time.perf_counter() - t0) * 1000
+        holes = {s: r for s, r in report.items() if r["found"]}
+        log.info("🩹 %s gap scan (symbols=%d, with_gaps=%d, unfilled=%d) %.1f ms",
+                 interval, len(SYMBOLS), len(holes), sum(r["unfilled"] for r in holes.values()), dt_ms)
+        for sym, r in holes.items():
+            log.info("🩹   %s/%s found=%d missing=%d unfilled=%d",
+                     interval, sym, r["found"], r["missing"], r["unfilled"])
+    except Exception:
+        log.exception("❌ %s kline gap repair error", interval)
 
-        for sym in SYMBOLS:
-            last_ts = store.last_ts("1", sym)
-            start_ms, end_ms = compute_fetch_window(
-                last_ts, "1", now_ms, keep_for, exclude_open=True
-            )
-            if start_ms is None:  # 가져올 것 없음
-                continue
-            bars = fetch_bybit_klines(sym, "1", start_ms, end_ms, limit=LIMIT_PER_CALL)
-            store.merge_increment("1", sym, bars)
 
-        store.flush_interval("1", SYMBOLS)
+def run_klines_minutely(store: IncrementalStore, SYMBOLS):
+    if not SYMBOLS:
+        log.warning("⏭️ SYMBOLS 비어 있음. 1m kline 작업 스킵")
+        return
+    t0 = time.perf_counter()
+    try:
+        now_ms = int(time.time() * 1000) + SKEW_MS_1M
+        stats = poll_increments(store, "1", SYMBOLS, now_ms)
         dt_ms = (time.perf_counter() - t0) * 1000
-        log.info("✅ 1m closed-only incremental (symbols=%d, keep=%d) %.1f ms",
-                 len(SYMBOLS), keep_for, dt_ms)
+        log.info("✅ 1m closed-only incremental (symbols=%d, keep=%d, fetched=%d, failed=%d) %.1f ms",
+                 len(SYMBOLS), store.keep_for("1"), stats["fetched"], stats["failed"], dt_ms)
     except Exception:
         log.exception("❌ 1m kline incremental error")
 
 
-def run_klines_daily(SYMBOLS):
+def run_klines_daily(store: IncrementalStore, SYMBOLS):
     if not SYMBOLS:
         log.warning("⏭️ SYMBOLS 비어 있음. 1D kline 작업 스킵")
         return
     t0 = time.perf_counter()
     try:
         now_ms = int(time.time() * 1000) + SKEW_MS_1D
-        keep_for = store.keep_for("D")
-
-        for sym in SYMBOLS:
-            last_ts = store.last_ts("D", sym)
-            start_ms, end_ms = compute_fetch_window(
-                last_ts, "D", now_ms, keep_for, exclude_open=True
-            )
-            if start_ms is None:
-                continue
-            bars = fetch_bybit_klines(sym, "D", start_ms, end_ms, limit=LIMIT_PER_CALL)
-            store.merge_increment("D", sym, bars)
-
-        store.flush_interval("D", SYMBOLS)
+        stats = poll_increments(store, "D", SYMBOLS, now_ms)
         dt_ms = (time.perf_counter() - t0) * 1000
-        log.info("✅ 1D closed-only incremental (symbols=%d, keep=%d) %.1f ms",
-                 len(SYMBOLS), keep_for, dt_ms)
+        log.info("✅ 1D closed-only incremental (symbols=%d, keep=%d, fetched=%d, failed=%d) %.1f ms",
+                 len(SYMBOLS), store.keep_for("D"), stats["fetched"], stats["failed"], dt_ms)
     except Exception:
         log.exception("❌ 1D kline incremental error")
 
 
+# ───────────────────────────────────────────────────────────
+# 테스트 실행 (__main__) - argparse 없이 ENV만 사용
+# ───────────────────────────────────────────────────────────
 if __name__ == "__main__":
     # 로깅
     logging.basicConfig(
@@ -434,7 +999,7 @@ if __name__ == "__main__":
     # ENV 파라미터
     SYMBOLS_ENV   = os.getenv("TEST_SYMBOLS", os.getenv("SYMBOLS", "BTCUSDT,ETHUSDT"))
     INTERVALS_ENV = os.getenv("TEST_INTERVALS", "1,D")
-    MODE          = os.getenv("TEST_MODE", "full_init").lower()   # full_init | step | loop
+    MODE          = os.getenv("TEST_MODE", "full_init").lower()   # full_init | step | loop | stream | gaps
     STEPS         = int(os.getenv("TEST_STEPS", "1"))
     SLEEP_SEC     = float(os.getenv("TEST_SLEEP", "60"))
 
@@ -446,7 +1011,7 @@ if __name__ == "__main__":
         except Exception:
             log.warning("TEST_LIMIT 파싱 실패, 기본 LIMIT_PER_CALL=%s 사용", LIMIT_PER_CALL)
 
-    # KEEP 적용
+    # KEEP 적용 (상위 봉은 1분봉 보관량에서 파생)
     keep_map = {"1": KEEP_1M, "D": KEEP_1D}
 
     # 심볼/인터벌 파싱
@@ -463,7 +1028,11 @@ if __name__ == "__main__":
         log.exception("Redis ping failed: %s", e)
         raise SystemExit(2)
 
-    store = IncrementalStore(keep_map=keep_map)
+    store = IncrementalStore(
+        keep_map=keep_map,
+        agg_intervals=kline_agg.KLINE_AGG_INTERVALS,
+        view_points=kline_views.KLINE_VIEW_POINTS,
+    )
 
     def do_full_init(iv: str):
         store.full_initialize(SYMBOLS_ARG, iv, exclude_open=True)
@@ -474,15 +1043,8 @@ if __name__ == "__main__":
 
     def do_step(iv: str):
         now_ms = int(time.time() * 1000) + (SKEW_MS_1M if iv == "1" else SKEW_MS_1D)
-        keep_for = store.keep_for(iv)
-        for sym in SYMBOLS_ARG:
-            last_ts = store.last_ts(iv, sym)
-            start_ms, end_ms = compute_fetch_window(last_ts, iv, now_ms, keep_for, exclude_open=True)
-            if start_ms is None:
-                continue
-            bars = fetch_bybit_klines(sym, iv, start_ms, end_ms, limit=LIMIT_PER_CALL)
-            store.merge_increment(iv, sym, bars)
-        store.flush_interval(iv, SYMBOLS_ARG)
+        stats = poll_increments(store, iv, SYMBOLS_ARG, now_ms)
+        log.info("[STEP] %s fetched=%d bars=%d failed=%d", iv, stats["fetched"], stats["bars"], stats["failed"])
         for sym in SYMBOLS_ARG:
             ts = store.last_ts(iv, sym)
             log.info("[STEP] %s/%s len=%d last_ts=%s",
@@ -510,7 +1072,18 @@ if __name__ == "__main__":
         elif MODE == "loop":
             for iv in INTERVALS_ARG:
                 do_loop(iv, STEPS, SLEEP_SEC)
+        elif MODE == "gaps":
+            for iv in INTERVALS_ARG:
+                store.load_or_backfill(SYMBOLS_ARG, iv)
+                run_gap_repair(store, SYMBOLS_ARG, iv)
+        elif MODE == "stream":
+            # BYBIT_WS_URL=ws://127.0.0.1:PORT 로 로컬 대역 서버에 붙여 테스트 가능
+            import asyncio
+            from kline_stream import KlineStreamer
+            for iv in INTERVALS_ARG:
+                store.load_or_backfill(SYMBOLS_ARG, iv)
+            asyncio.run(KlineStreamer(store, SYMBOLS_ARG, INTERVALS_ARG).run())
         else:
-            log.error("알 수 없는 TEST_MODE: %s (full_init|step|loop 중 하나)", MODE)
+            log.error("알 수 없는 TEST_MODE: %s (full_init|step|loop|stream|gaps 중 하나)", MODE)
     except KeyboardInterrupt:
         log.info("Interrupted by user.")
@@ -0,0 +1,89 @@
+# indicators.py
+# 차트 지표 계산 (배열 기반)
+#
+# - 이동평균은 누적합(prefix sum)으로 계산 → 봉 개수와 무관하게 O(n)
+# - 입력은 1차원(한 종목) 또는 2차원(종목 × 시간) 배열 모두 가능
+# - 길이가 다른 종목 묶음은 앞쪽을 NaN으로 채워 한 번에 계산 (batch_indicators, chart_data는 카테고리 단위로 사용)
+# - KIS 일봉(지수정보가져오기.fetch_stock_info)과 DXY 계산이 같은 구현을 공유
+import numpy as np
+
+MA_KEY = "ma100"
+
+# envelope 이름 → 비율
+ENVELOPES = {
+    "envelope10": 0.10,
+    "envelope3": 0.03,
+}
+
+# 행(dict)에 붙는 지표 컬럼 순서
+INDICATOR_KEYS = [MA_KEY] + [
+    f"{name}_{side}" for name in ENVELOPES for side in ("upper", "lower")
+]
+
+
+def rolling_mean(values, period=100):
+    """
+    마지막 축 기준 단순 이동평균.
+    윈도우가 덜 찼거나 NaN이 섞인 구간은 NaN.
+    """
+    arr = np.asarray(values, dtype=np.float64)
+    out = np.full(arr.shape, np.nan)
+    n = arr.shape[-1]
+    if period <= 0 or n < period:
+        return out
+
+    nan_mask = np.isnan(arr)
+    zero_pad = np.zeros(arr.shape[:-1] + (1,))
+    csum = np.concatenate([zero_pad, np.cumsum(np.where(nan_mask, 0.0, arr), axis=-1)], axis=-1)
+    cnan = np.concatenate([zero_pad, np.cumsum(nan_mask, axis=-1)], axis=-1)
+
+    window_sum = csum[..., period:] - csum[..., :-period]
+    window_nan = cnan[..., period:] - cnan[..., :-period]
+    out[..., period - 1:] = np.where(window_nan > 0, np.nan, window_sum / period)
+    return out
+
+
+def envelope(moving_avg, percentage):
+    ma = np.asarray(moving_avg, dtype=np.float64)
+    return ma * (1 + percentage), ma * (1 - percentage)
+
+
+def compute_indicators(closes, ma_period=100):
+    """종가 배열(1D/2D) → {지표명: 같은 shape 배열}"""
+    ma = rolling_mean(closes, ma_period)
+    out = {MA_KEY: ma}
+    for name, pct in ENVELOPES.items():
+        out[f"{name}_upper"], out[f"{name}_lower"] = envelope(ma, pct)
+    return out
+
+
+def batch_indicators(close_series, ma_period=100):
+    """
+    길이가 서로 다른 종가 리스트 묶음을 한 번에 계산.
+    반환: 입력 순서대로 {지표명: 1D 배열} (각 종목 길이에 맞게 잘라서)
+    """
+    if not close_series:
+        return []
+    width = max(len(c) for c in close_series)
+    batch = np.full((len(close_series), width), np.nan)
+    for i, closes in enumerate(close_series):
+        if len(closes):
+            batch[i, width - len(closes):] = closes
+
+    ind = compute_indicators(batch, ma_period)
+    return [
+        {k: v[i, width - len(closes):] for k, v in ind.items()}
+        for i, closes in enumerate(close_series)
+    ]
+
+
+def attach_indicators(rows, indicators, start=0):
+    """
+    rows[start:]에 지표 값을 채워 넣음.
+    indicators는 rows 전체 길이와 같은 배열 dict (compute_indicators 결과).
+    """
+    columns = [(k, indicators[k][start:len(rows)].tolist()) for k in INDICATOR_KEYS]
+    for offset, row in enumerate(rows[start:]):
+        for k, values in columns:
+            row[k] = values[offset]
+    return rows
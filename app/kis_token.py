@@ -0,0 +1,168 @@
+# kis_token.py
+# KIS 접근 토큰 관리
+#
+# 조회 순서: 프로세스 메모리 → Redis(kis:access_token) → 발급
+# - 만료 KIS_TOKEN_REFRESH_AHEAD_SEC 전부터는 갱신 대상
+# - 갱신은 Redis 분산 락(kis:access_token:lock)을 잡은 한 프로세스만 수행,
+#   나머지는 락이 풀린 뒤 Redis에 올라온 새 토큰을 재사용 (KIS 토큰 발급 제한 회피)
+# - Redis를 쓸 수 없으면 기존처럼 token_cache.json 파일 캐시 사용
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+
+import requests
+
+log = logging.getLogger(__name__)
+
+TOKEN_URL = "https://openapi.koreainvestment.com:9443/oauth2/tokenP"
+CACHE_PATH = Path(__file__).resolve().parent / "token_cache.json"
+REDIS_TOKEN_KEY = "kis:access_token"
+REFRESH_AHEAD_SEC = int(os.getenv("KIS_TOKEN_REFRESH_AHEAD_SEC", "1800"))
+LOCK_TIMEOUT_SEC = 30
+
+
+def load_cached_token():
+    if CACHE_PATH.exists():
+        with open(CACHE_PATH, "r") as f:
+            cache = json.load(f)
+            expires_at = datetime.fromisoformat(cache["expires_at"])
+            if datetime.now() < expires_at:
+                return cache["access_token"], expires_at.timestamp()
+    return None
+
+
+def save_token_to_cache(access_token, expires_at_ts):
+    with open(CACHE_PATH, "w") as f:
+        json.dump({
+            "access_token": access_token,
+            "expires_at": datetime.fromtimestamp(expires_at_ts).isoformat()
+        }, f)
+
+
+def request_new_token(app_key, app_secret):
+    """KIS 토큰 발급 → (access_token, 만료 epoch 초)"""
+    print("🔐 Requesting new access token...")
+    headers = {"Content-Type": "application/json; charset=UTF-8"}
+    body = {
+        "grant_type": "client_credentials",
+        "appkey": app_key,
+        "appsecret": app_secret
+    }
+    response = requests.post(TOKEN_URL, headers=headers, json=body)
+    response.raise_for_status()
+    data = response.json()
+    expires_at_str = data.get("access_token_token_expired")
+    if expires_at_str:
+        # KIS 응답은 로컬(KST) 시각 문자열
+        expires_at = datetime.strptime(expires_at_str, "%Y-%m-%d %H:%M:%S")
+    else:
+        # 만료 시간 정보가 없을 경우 24시간 유효
+        expires_at = datetime.now() + timedelta(hours=24)
+    return data["access_token"], expires_at.timestamp()
+
+
+class KisTokenManager:
+    def __init__(self, app_key, app_secret, redis=None, refresh_ahead_sec=REFRESH_AHEAD_SEC):
+        self.app_key = app_key
+        self.app_secret = app_secret
+        self.redis = redis
+        self.refresh_ahead_sec = refresh_ahead_sec
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fresh(self, expires_at):
+        return time.time() < expires_at - self.refresh_ahead_sec
+
+    def _read_redis(self):
+        raw = self.redis.get(REDIS_TOKEN_KEY)
+        if not raw:
+            return None
+        cached = json.loads(raw)
+        return cached["access_token"], float(cached["expires_at"])
+
+    def _write_redis(self, token, expires_at):
+        ttl = int(expires_at - time.time())
+        if ttl > 0:
+            self.redis.set(REDIS_TOKEN_KEY, json.dumps({"access_token": token, "expires_at": expires_at}), ex=ttl)
+
+    def _remember(self, token, expires_at):
+        self._token, self._expires_at = token, expires_at
+        return token
+
+    def get(self):
+        if self._token and self._fresh(self._expires_at):
+            return self._token
+
+        # 같은 프로세스 안에서는 한 스레드만 갱신 경로로 진입
+        with self._lock:
+            if self._token and self._fresh(self._expires_at):
+                return self._token
+            if self.redis is None:
+                return self._get_from_file()
+            try:
+                return self._get_from_redis()
+            except Exception:
+                log.warning("KIS 토큰 Redis 캐시 사용 실패, 파일 캐시로 진행", exc_info=True)
+                return self._get_from_file()
+
+    def _get_from_redis(self):
+        cached = self._read_redis()
+        if cached and self._fresh(cached[1]):
+            print("✅ Using cached access token.")
+            return self._remember(*cached)
+
+        lock = self.redis.lock(REDIS_TOKEN_KEY + ":lock", timeout=LOCK_TIMEOUT_SEC,
+                               blocking_timeout=LOCK_TIMEOUT_SEC)
+        if not lock.acquire():
+            # 다른 프로세스가 갱신 중 → 그 결과(또는 아직 유효한 기존 토큰) 사용
+            cached = self._read_redis()
+            if cached and time.time() < cached[1]:
+                return self._remember(*cached)
+            raise RuntimeError("KIS 토큰 갱신 락 대기 시간 초과")
+        try:
+            # 락 대기 중 다른 프로세스가 이미 갱신했을 수 있음
+            cached = self._read_redis()
+            if cached and self._fresh(cached[1]):
+                return self._remember(*cached)
+            token, expires_at = request_new_token(self.app_key, self.app_secret)
+            self._write_redis(token, expires_at)
+            save_token_to_cache(token, expires_at)
+            return self._remember(token, expires_at)
+        finally:
+            try:
+                lock.release()
+            except Exception:
+                pass
+
+    def _get_from_file(self):
+        cached = load_cached_token()
+        if cached and self._fresh(cached[1]):
+            print("✅ Using cached access token.")
+            return self._remember(*cached)
+        token, expires_at = request_new_token(self.app_key, self.app_secret)
+        save_token_to_cache(token, expires_at)
+        return self._remember(token, expires_at)
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_token_manager(app_key, app_secret):
+    """app_key별 프로세스 공용 매니저"""
+    with _managers_lock:
+        manager = _managers.get(app_key)
+        if manager is None:
+            try:
+                from redis_client import redis_client
+            except Exception:
+                log.warning("Redis 클라이언트 사용 불가, KIS 토큰은 파일 캐시만 사용", exc_info=True)
+                redis_client = None
+            manager = KisTokenManager(app_key, app_secret, redis=redis_client)
+            _managers[app_key] = manager
+        return manager
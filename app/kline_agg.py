@@ -0,0 +1,68 @@
+# kline_agg.py
+# 1분봉 → 상위 봉(5m/15m/1h/4h) 로컬 집계 (추가 Bybit 호출 없음)
+#
+# - 버킷 경계는 UTC epoch 기준 (Bybit 봉 경계와 동일)
+# - 버킷 마지막 1분봉 시각까지 들어온 버킷만 확정 봉으로 내보냄 (진행 중 버킷 제외)
+# - 버퍼 맨 앞이 버킷 중간에서 시작하면 그 버킷은 불완전하므로 제외
+# - IncrementalStore가 1분봉 병합 시 바뀐 구간부터만 다시 집계해 같은 저장 형식으로 flush
+# - 차트 뷰(kline_views)도 같은 aggregate()를 쓰되 진행 중 버킷까지 포함 (include_partial)
+import os
+from typing import Dict, List
+
+import numpy as np
+
+BASE_INTERVAL = "1"
+BASE_STEP_SEC = 60
+
+# Bybit interval 코드 → 분
+AGG_MINUTES = {"5": 5, "15": 15, "60": 60, "240": 240}
+KLINE_AGG_INTERVALS = [
+    iv.strip() for iv in os.getenv("KLINE_AGG_INTERVALS", "5,15,60,240").split(",")
+    if iv.strip() in AGG_MINUTES
+]
+
+
+def agg_keep_map(keep_1m: int, intervals: List[str] = KLINE_AGG_INTERVALS) -> Dict[str, int]:
+    """1분봉 보관 개수로 만들 수 있는 만큼만 보관"""
+    return {iv: max(1, keep_1m // AGG_MINUTES[iv]) for iv in intervals}
+
+
+def interval_step_sec(interval: str) -> int:
+    return AGG_MINUTES[interval] * 60
+
+
+def bucket_start(t: int, step_sec: int) -> int:
+    return t - t % step_sec
+
+
+def aggregate(cols: Dict[str, np.ndarray], step_sec: int, first_time: int, include_partial: bool = False) -> List[Dict]:
+    """
+    1분봉 컬럼(time 오름차순) → step_sec 단위 봉 dict 리스트.
+    first_time: 1분봉 버퍼 전체의 첫 봉 time (그보다 앞에서 시작하는 버킷은 불완전)
+    include_partial: 진행 중인 마지막 버킷도 포함 (차트 뷰용)
+    """
+    t = cols["time"]
+    if len(t) == 0:
+        return []
+    b = t - t % step_sec
+    starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+    ends = np.r_[starts[1:], len(t)]
+    buckets = b[starts]
+
+    # 앞이 잘린 버킷, (include_partial이 아니면) 마지막 1분봉이 버킷 끝에 못 미친 진행 중 버킷 제외
+    keep = buckets >= first_time
+    if not include_partial:
+        keep &= buckets + step_sec - BASE_STEP_SEC <= t[-1]
+    if not keep.any():
+        return []
+
+    out = {
+        "time": buckets,
+        "open": cols["open"][starts],
+        "high": np.maximum.reduceat(cols["high"], starts),
+        "low": np.minimum.reduceat(cols["low"], starts),
+        "close": cols["close"][ends - 1],
+    }
+    names = list(out)
+    lists = [out[c][keep].tolist() for c in names]
+    return [dict(zip(names, row)) for row in zip(*lists)]
@@ -0,0 +1,136 @@
+# kline_codec.py
+# 봉 배열 바이너리 코덱 (kline:{interval}:* 저장용)
+#
+#   [헤더 8바이트] magic "KB" | version(u8) | flags(u8) | count(u32, LE)
+#   [본문]        time int64[count] | open | high | low | close (| volume) float64[count]  (컬럼 순서, LE)
+#
+# - flags: FLAG_ZLIB(본문 zlib 압축), FLAG_VOLUME(volume 컬럼 포함)
+# - base64 없이 bytes 그대로 Redis에 저장
+# - unpack_columns()는 numpy.frombuffer로 본문을 그대로 가리키는 배열을 반환 (봉별 dict 생성 없음)
+# - unpack_bars()는 기존 JSON 리더와 같은 dict 리스트를 반환 (호환용)
+import sys
+import zlib
+import struct
+from typing import TYPE_CHECKING, Dict, List
+
+if TYPE_CHECKING:  # numpy는 컬럼 함수에서만 지연 import
+    import numpy as np
+
+MAGIC = b"KB"
+VERSION = 2              # kline:{interval}:json 의 __schema_version 과 같은 값
+FLAG_ZLIB = 0x01
+FLAG_VOLUME = 0x02
+
+HEADER = struct.Struct("<2sBBI")
+PRICE_COLUMNS = ("open", "high", "low", "close")
+
+# 기록 구조(structured dtype) 변환에 쓰는 리틀엔디언 가정
+_LITTLE = sys.byteorder == "little"
+
+
+def is_packed(raw) -> bool:
+    return isinstance(raw, (bytes, bytearray, memoryview)) and bytes(raw[:2]) == MAGIC
+
+
+def columns_for(flags: int):
+    return ("time",) + PRICE_COLUMNS + (("volume",) if flags & FLAG_VOLUME else ())
+
+
+def pack_bars(bars: List[Dict], compress: bool = False) -> bytes:
+    """dict 봉 리스트(오래→최신) → 바이너리"""
+    n = len(bars)
+    with_volume = n > 0 and all("volume" in b for b in bars)
+    flags = FLAG_VOLUME if with_volume else 0
+
+    body = struct.pack(f"<{n}q", *(int(b["time"]) for b in bars))
+    for col in columns_for(flags)[1:]:
+        body += struct.pack(f"<{n}d", *(float(b[col]) for b in bars))
+
+    if compress:
+        body = zlib.compress(body, level=6)
+        flags |= FLAG_ZLIB
+    return HEADER.pack(MAGIC, VERSION, flags, n) + body
+
+
+def pack_columns(cols: Dict[str, "np.ndarray"], compress: bool = False) -> bytes:
+    """컬럼 배열(kline_ring.BarRing.columns() 등) → 바이너리 (봉별 dict 변환 없음)"""
+    import numpy as np
+
+    n = len(cols["time"])
+    flags = FLAG_VOLUME if "volume" in cols else 0
+    parts = [np.asarray(cols["time"], dtype="<i8").tobytes()]
+    parts += [np.asarray(cols[c], dtype="<f8").tobytes() for c in columns_for(flags)[1:]]
+    body = b"".join(parts)
+
+    if compress:
+        body = zlib.compress(body, level=6)
+        flags |= FLAG_ZLIB
+    return HEADER.pack(MAGIC, VERSION, flags, n) + body
+
+
+def _header(raw):
+    magic, version, flags, n = HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError("not a packed kline buffer")
+    if version != VERSION:
+        raise ValueError(f"unsupported kline codec version: {version}")
+    return flags, n
+
+
+def _body(raw, flags):
+    body = memoryview(raw)[HEADER.size:]
+    return memoryview(zlib.decompress(body)) if flags & FLAG_ZLIB else body
+
+
+def unpack_columns(raw) -> Dict[str, "np.ndarray"]:
+    """바이너리 → {컬럼명: numpy 배열} (압축이 없으면 raw를 복사 없이 가리킴, 읽기 전용)"""
+    import numpy as np
+
+    flags, n = _header(raw)
+    body = _body(raw, flags)
+    out = {"time": np.frombuffer(body, dtype="<i8", count=n, offset=0)}
+    for i, col in enumerate(columns_for(flags)[1:], start=1):
+        out[col] = np.frombuffer(body, dtype="<f8", count=n, offset=8 * n * i)
+    return out
+
+
+def unpack_bars(raw) -> List[Dict]:
+    """바이너리 → dict 봉 리스트 (기존 JSON 형식과 동일)"""
+    flags, n = _header(raw)
+    body = _body(raw, flags)
+    cols = columns_for(flags)
+    times = body[:8 * n].cast("q") if _LITTLE else struct.unpack(f"<{n}q", body[:8 * n])
+    values = []
+    for i in range(1, len(cols)):
+        part = body[8 * n * i: 8 * n * (i + 1)]
+        values.append(part.cast("d") if _LITTLE else struct.unpack(f"<{n}d", part))
+    return [
+        dict(zip(cols, (times[j],) + tuple(v[j] for v in values)))
+        for j in range(n)
+    ]
+
+
+def record_dtype(flags: int = 0):
+    """비압축 1봉짜리 버퍼(헤더+봉 1개)를 한 레코드로 보는 numpy dtype"""
+    import numpy as np
+
+    fields = [("magic", "S2"), ("version", "u1"), ("flags", "u1"), ("count", "<u4"), ("time", "<i8")]
+    fields += [(c, "<f8") for c in columns_for(flags)[1:]]
+    return np.dtype(fields)
+
+
+def unpack_single_bar_items(items: List[bytes]) -> Dict[str, "np.ndarray"]:
+    """
+    1봉씩 저장된 리스트 원소들(비압축, 같은 flags) → 컬럼 배열.
+    원소들을 한 번 이어 붙인 뒤 레코드 dtype으로 해석하므로 봉별 파싱이 없음.
+    """
+    import numpy as np
+
+    if not items:
+        return {c: np.empty(0, dtype="<i8" if c == "time" else "<f8") for c in columns_for(0)}
+    flags, _ = _header(items[0])
+    dt = record_dtype(flags)
+    recs = np.frombuffer(b"".join(items), dtype=dt)
+    if (recs["count"] != 1).any() or (recs["flags"] != flags).any():
+        raise ValueError("list items are not uniform single-bar buffers")
+    return {c: recs[c] for c in columns_for(flags)}
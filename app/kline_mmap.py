@@ -0,0 +1,130 @@
+# kline_mmap.py
+# 인터벌별 로컬 컬럼 스냅샷 (메모리 맵, 재시작 시 즉시 복구용)
+#
+#   {KLINE_SNAPSHOT_DIR}/kline_{interval}.bin
+#   [헤더 12바이트] magic "KLMM" | version(u16) | reserved(u16) | index 길이(u32)   (LE)
+#   [index JSON]   {"written_at": ..., "total": N, "symbols": [[sym, offset, count], ...]}
+#   [8바이트 정렬 패딩]
+#   [본문]         time int64[N] | open | high | low | close float64[N]  (컬럼별로 전 심볼 이어 붙임)
+#
+# - IncrementalStore flush 직후 임시 파일에 쓰고 os.replace로 교체 (원자적, 읽는 쪽은 항상 완전한 파일)
+# - 시작 시 mmap으로 열어 numpy.frombuffer view로 읽음 → 링 버퍼로 한 번 복사 후 닫음
+# - Redis는 그대로 다른 소비자용 원본. 이 파일은 kline 프로세스 자신의 재시작용
+import os
+import json
+import mmap
+import time
+import struct
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from kline_ring import COLUMNS
+
+KLINE_LOCAL_SNAPSHOT = os.getenv("KLINE_LOCAL_SNAPSHOT", "1") == "1"
+KLINE_SNAPSHOT_DIR = Path(os.getenv("KLINE_SNAPSHOT_DIR", str(Path(__file__).resolve().parent / "kline_snapshot")))
+
+MAGIC = b"KLMM"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+
+log = logging.getLogger("kline_mmap")
+
+
+def snapshot_path(interval: str) -> Path:
+    return KLINE_SNAPSHOT_DIR / f"kline_{interval}.bin"
+
+
+def _dtype(col: str) -> str:
+    return "<i8" if col == "time" else "<f8"
+
+
+def write_snapshot(interval: str, cols_by_sym: Dict[str, Dict[str, np.ndarray]]):
+    """{sym: {컬럼: 배열}} → 스냅샷 파일 원자적 교체"""
+    symbols, offset = [], 0
+    for sym, cols in cols_by_sym.items():
+        n = len(cols["time"])
+        symbols.append([sym, offset, n])
+        offset += n
+    index = json.dumps({
+        "written_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "total": offset,
+        "symbols": symbols,
+    }, separators=(",", ":")).encode("utf-8")
+    head = HEADER.pack(MAGIC, VERSION, 0, len(index)) + index
+    head += b"\0" * (-len(head) % 8)
+
+    path = snapshot_path(interval)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(head)
+            for c in COLUMNS:
+                for cols in cols_by_sym.values():
+                    f.write(np.ascontiguousarray(cols[c], dtype=_dtype(c)).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+class Snapshot:
+    """mmap으로 연 스냅샷. columns(sym)는 파일을 그대로 가리키는 읽기 전용 view (close 전까지 유효)"""
+
+    def __init__(self, path: Path):
+        self._f = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _, index_len = HEADER.unpack_from(self._mm)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"unsupported kline snapshot: {path}")
+            index = json.loads(self._mm[HEADER.size:HEADER.size + index_len])
+        except Exception:
+            self.close()
+            raise
+        self.written_at = index["written_at"]
+        self._total = index["total"]
+        self._data_off = HEADER.size + index_len + (-(HEADER.size + index_len) % 8)
+        self.symbols = {sym: (off, n) for sym, off, n in index["symbols"]}
+
+    def columns(self, sym: str) -> Optional[Dict[str, np.ndarray]]:
+        if sym not in self.symbols:
+            return None
+        off, n = self.symbols[sym]
+        return {
+            c: np.frombuffer(self._mm, dtype=_dtype(c), count=n, offset=self._data_off + 8 * (i * self._total + off))
+            for i, c in enumerate(COLUMNS)
+        }
+
+    def close(self):
+        mm = getattr(self, "_mm", None)
+        if mm is not None:
+            try:
+                mm.close()
+            except BufferError:
+                pass  # 아직 남은 view가 있으면 GC 때 해제
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_snapshot(interval: str) -> Optional[Snapshot]:
+    """스냅샷이 없거나 깨졌으면 None"""
+    path = snapshot_path(interval)
+    if not KLINE_LOCAL_SNAPSHOT or not path.exists():
+        return None
+    try:
+        return Snapshot(path)
+    except Exception:
+        log.warning("⚠️ 로컬 kline 스냅샷 읽기 실패: %s", path, exc_info=True)
+        return None
@@ -0,0 +1,159 @@
+# kline_ring.py
+# 봉 버퍼: 컬럼(numpy) 기반 고정 용량 링 버퍼
+#
+# - time(int64), open/high/low/close(float64) 컬럼을 각각 연속 배열로 보관
+#   → 봉당 40바이트 (+ 여유 공간), dict 봉(수백 바이트)을 들고 있지 않음
+# - 저장 공간을 용량보다 조금 크게(slack) 잡고 head 인덱스(_start)를 앞으로 밀며 추가,
+#   끝에 닿으면 살아있는 구간을 앞으로 한 번 당김(봉당 상각 O(1))
+#   → 유효 구간이 항상 연속이라 columns()/times()가 복사 없는 view를 돌려줄 수 있음
+#   (view는 다음 변경 전까지만 유효)
+# - deque 시절 코드 호환: len(), 인덱싱(ring[-1]["time"]), 반복 시 dict 봉을 만들어 반환
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+COLUMNS = ("time", "open", "high", "low", "close")
+PRICE_COLUMNS = COLUMNS[1:]
+
+
+class BarRing:
+    def __init__(self, maxlen: int, bars: Optional[Iterable[Dict]] = None):
+        self.maxlen = maxlen
+        self._size = maxlen + max(16, maxlen // 4)
+        self._cols = {
+            c: np.zeros(self._size, dtype=np.int64 if c == "time" else np.float64)
+            for c in COLUMNS
+        }
+        self._start = 0
+        self._n = 0
+        if bars:
+            self.extend(bars)
+
+    # ── 조회
+    def __len__(self) -> int:
+        return self._n
+
+    def __bool__(self) -> bool:
+        return self._n > 0
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """{컬럼명: 유효 구간 view} (복사 없음)"""
+        s, e = self._start, self._start + self._n
+        return {c: a[s:e] for c, a in self._cols.items()}
+
+    def times(self) -> np.ndarray:
+        return self._cols["time"][self._start:self._start + self._n]
+
+    def last_time(self) -> Optional[int]:
+        return int(self._cols["time"][self._start + self._n - 1]) if self._n else None
+
+    def _bar_at(self, pos: int) -> Dict:
+        return {c: self._cols[c][pos].item() for c in COLUMNS}
+
+    def __getitem__(self, i: int) -> Dict:
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("BarRing index out of range")
+        return self._bar_at(self._start + i)
+
+    def to_bars(self, start: int = 0) -> List[Dict]:
+        """start번째(0=가장 오래된) 이후 봉을 dict 리스트로"""
+        cols = self.columns()
+        lists = [cols[c][start:].tolist() for c in COLUMNS]
+        return [dict(zip(COLUMNS, row)) for row in zip(*lists)]
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.to_bars())
+
+    def __reversed__(self) -> Iterator[Dict]:
+        return reversed(self.to_bars())
+
+    def index_of(self, t: int) -> int:
+        """time 오름차순 가정, t 이상인 첫 봉 위치(searchsorted)"""
+        return int(np.searchsorted(self.times(), t, side="left"))
+
+    # ── 변경
+    def clear(self):
+        self._start = 0
+        self._n = 0
+
+    def _truncate(self, n: int):
+        self._n = n
+
+    def _append_columns(self, times: List[int], values: Dict[str, List[float]]):
+        k = len(times)
+        if k == 0:
+            return
+        if k >= self.maxlen:
+            times = times[-self.maxlen:]
+            values = {c: v[-self.maxlen:] for c, v in values.items()}
+            k = self.maxlen
+            self.clear()
+
+        overflow = self._n + k - self.maxlen
+        if overflow > 0:  # 용량 초과분은 가장 오래된 쪽에서 버림
+            self._start += overflow
+            self._n -= overflow
+
+        end = self._start + self._n
+        if end + k > self._size:  # 뒤 공간 부족 → 살아있는 구간을 앞으로 당김
+            for a in self._cols.values():
+                a[:self._n] = a[self._start:end]
+            self._start, end = 0, self._n
+
+        self._cols["time"][end:end + k] = times
+        for c in PRICE_COLUMNS:
+            self._cols[c][end:end + k] = values[c]
+        self._n += k
+
+    def extend(self, bars: Iterable[Dict]):
+        """time 오름차순 봉들을 뒤에 추가 (정렬/중복은 호출 측 책임)"""
+        bars = list(bars)
+        self._append_columns(
+            [int(b["time"]) for b in bars],
+            {c: [float(b[c]) for b in bars] for c in PRICE_COLUMNS},
+        )
+
+    def extend_columns(self, cols: Dict[str, np.ndarray]):
+        """컬럼 배열(time 오름차순)을 그대로 뒤에 추가 (dict 변환 없음)"""
+        self._append_columns(cols["time"], {c: cols[c] for c in PRICE_COLUMNS})
+
+    def append(self, bar: Dict):
+        self.extend([bar])
+
+    def merge(self, new_bars: List[Dict]) -> bool:
+        """
+        같은 time은 덮어쓰고 나머지는 정렬 위치에 넣음.
+        가장 오래된 새 봉 이후 꼬리 구간만 다시 씀 (보통 O(새 봉 수), 정렬/중복 제거는 numpy).
+        반환: 기존 봉 사이에 새 time이 끼어들었으면 True
+        """
+        if not new_bars:
+            return False
+        incoming = {int(b["time"]): b for b in new_bars}
+        new_t = np.fromiter(sorted(incoming), dtype=np.int64, count=len(incoming))
+        pos = self.index_of(int(new_t[0]))
+
+        cols = self.columns()
+        tail_t = cols["time"][pos:]
+        inserted = False
+        if len(tail_t):
+            at = np.searchsorted(tail_t, new_t)
+            found = tail_t[np.minimum(at, len(tail_t) - 1)] == new_t
+            inserted = bool(((new_t < tail_t[-1]) & ~found).any())
+
+        # 꼬리 + 새 봉을 이어 붙여 안정 정렬 → 같은 time이면 뒤(새 봉)만 남김
+        all_t = np.concatenate([tail_t, new_t])
+        order = np.argsort(all_t, kind="stable")
+        sorted_t = all_t[order]
+        last_of_group = np.append(sorted_t[1:] != sorted_t[:-1], True)
+        pick = order[last_of_group]
+
+        values = {}
+        for c in PRICE_COLUMNS:
+            new_c = np.array([float(incoming[t][c]) for t in new_t.tolist()], dtype=np.float64)
+            values[c] = np.concatenate([cols[c][pos:], new_c])[pick]
+
+        self._truncate(pos)
+        self._append_columns(all_t[pick], values)
+        return inserted
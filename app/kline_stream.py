@@ -0,0 +1,167 @@
+# kline_stream.py
+# Bybit 공개 WebSocket kline 스트림 → IncrementalStore (REST 폴링 대체 모드)
+#
+# - kline.{interval}.{symbol} 구독, confirm=true(마감 확정) 봉만 스토어에 병합
+# - 같은 시점에 마감된 봉들은 STREAM_FLUSH_DELAY_MS 동안 모아 인터벌별 flush 1회
+# - (재)연결마다 구독 직후 REST로 compute_fetch_window 기반 보충(poll_increments)
+#   → 끊겨 있던 동안 놓친 봉 복구. 보충이 끝난 뒤에 수신 루프를 시작하므로
+#     스토어는 항상 이벤트 루프 한 곳에서만 변경됨(보충은 워커 스레드에서 돌지만 그동안 수신은 대기)
+# - BYBIT_WS_URL로 주소 변경 가능 (로컬 WebSocket 대역 서버로 테스트)
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Set
+
+import websockets
+
+from coin_backfill import IncrementalStore, poll_increments, SKEW_MS_1M, SKEW_MS_1D
+
+BYBIT_WS_URL = os.getenv("BYBIT_WS_URL", "wss://stream.bybit.com/v5/public/linear")
+STREAM_FLUSH_DELAY_MS = int(os.getenv("STREAM_FLUSH_DELAY_MS", "200"))
+STREAM_PING_SEC = float(os.getenv("STREAM_PING_SEC", "20"))
+STREAM_RECONNECT_MAX_SEC = float(os.getenv("STREAM_RECONNECT_MAX_SEC", "30"))
+SUBSCRIBE_BATCH = 10  # Bybit 구독 요청 1회당 args 개수 제한
+
+log = logging.getLogger("kline_stream")
+
+
+def bar_from_ws(item: Dict) -> Dict:
+    return {
+        "time":  int(item["start"]) // 1000,  # seconds
+        "open":  float(item["open"]),
+        "high":  float(item["high"]),
+        "low":   float(item["low"]),
+        "close": float(item["close"]),
+    }
+
+
+class KlineStreamer:
+    def __init__(
+        self,
+        store: IncrementalStore,
+        symbols: List[str],
+        intervals: List[str],
+        url: str = BYBIT_WS_URL,
+        catch_up: Optional[Callable] = None,
+    ):
+        self.store = store
+        self.symbols = symbols
+        self.intervals = intervals
+        self.url = url
+        # catch_up(store, interval, symbols, now_ms) → 기본은 REST 증분 수집
+        self.catch_up = catch_up or poll_increments
+        self._pending: Dict[str, Set[str]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+        self._ws = None
+        self.stats = {"connects": 0, "bars": 0, "flushes": 0}
+
+    def topics(self) -> List[str]:
+        return [f"kline.{iv}.{s}" for iv in self.intervals for s in self.symbols]
+
+    def stop(self):
+        """이벤트 루프 스레드에서 호출"""
+        self._stop.set()
+        if self._ws is not None:
+            asyncio.get_running_loop().create_task(self._ws.close())
+
+    # ── 수신 처리
+    def handle_message(self, msg: Dict) -> int:
+        """kline 메시지 1건 처리 → 병합한 확정 봉 수"""
+        topic = msg.get("topic") or ""
+        if not topic.startswith("kline."):
+            return 0
+        _, interval, sym = topic.split(".", 2)
+        bars = [bar_from_ws(it) for it in msg.get("data") or [] if it.get("confirm")]
+        if not bars:
+            return 0
+        self.store.merge_increment(interval, sym, bars)
+        self._pending.setdefault(interval, set()).add(sym)
+        self.stats["bars"] += len(bars)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+        return len(bars)
+
+    async def _flush_later(self):
+        await asyncio.sleep(STREAM_FLUSH_DELAY_MS / 1000)
+        self.flush_pending()
+
+    def flush_pending(self):
+        pending, self._pending = self._pending, {}
+        for interval, syms in pending.items():
+            try:
+                self.store.flush_interval(interval, sorted(syms))
+                self.stats["flushes"] += 1
+            except Exception:
+                log.exception("❌ %s kline flush 실패 (symbols=%d)", interval, len(syms))
+                # 다음 flush에서 다시 시도
+                self._pending.setdefault(interval, set()).update(syms)
+
+    # ── 연결
+    async def _subscribe(self, ws):
+        topics = self.topics()
+        for i in range(0, len(topics), SUBSCRIBE_BATCH):
+            await ws.send(json.dumps({"op": "subscribe", "args": topics[i:i + SUBSCRIBE_BATCH]}))
+
+    async def _ping(self, ws):
+        while True:
+            await asyncio.sleep(STREAM_PING_SEC)
+            await ws.send(json.dumps({"op": "ping"}))
+
+    async def _catch_up(self):
+        """끊긴 동안 놓친 닫힌 봉 REST 보충 (스레드에서 실행)"""
+        now = int(time.time() * 1000)
+        for interval in self.intervals:
+            skew = SKEW_MS_1M if interval == "1" else SKEW_MS_1D
+            stats = await asyncio.to_thread(self.catch_up, self.store, interval, self.symbols, now + skew)
+            log.info("🔁 %s REST 보충: %s", interval, stats)
+
+    async def _session(self):
+        async with websockets.connect(self.url, ping_interval=None, max_queue=None) as ws:
+            self._ws = ws
+            self.stats["connects"] += 1
+            await self._subscribe(ws)
+            await self._catch_up()
+            pinger = asyncio.create_task(self._ping(ws))
+            try:
+                async for raw in ws:
+                    if self._stop.is_set():
+                        break
+                    try:
+                        msg = json.loads(raw)
+                    except ValueError:
+                        continue
+                    if msg.get("op") == "subscribe" and not msg.get("success", True):
+                        log.warning("⚠️ 구독 실패: %s", msg.get("ret_msg"))
+                        continue
+                    self.handle_message(msg)
+            finally:
+                pinger.cancel()
+                self._ws = None
+
+    async def run(self):
+        """stop() 전까지 연결 유지, 끊기면 지수 백오프로 재연결"""
+        backoff = 1.0
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                await self._session()
+            except (OSError, websockets.WebSocketException) as e:
+                log.warning("⚠️ kline WS 연결 끊김: %s", e)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("❌ kline WS 처리 오류")
+            finally:
+                self.flush_pending()
+            if self._stop.is_set():
+                break
+            if time.monotonic() - started > 60:
+                backoff = 1.0
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, STREAM_RECONNECT_MAX_SEC)
@@ -0,0 +1,40 @@
+# kline_views.py
+# 1분봉 차트 뷰: 고정 해상도(예: 500 / 1,000 포인트) OHLC 버킷 다운샘플
+#
+# - 1분봉 보관 개수(KEEP_1M)를 points개 이하 버킷으로 묶음: 버킷 폭 = ceil(KEEP_1M / points)분, epoch 기준 정렬
+#   → 새 1분봉이 들어와도 마지막 버킷(진행 중 포함)만 바뀌므로 증분 갱신/전송이 가능
+# - 버킷 폭은 import 시 환경변수로 고정 (kline_agg.AGG_MINUTES처럼 스토어 없이도 step_ms 조회 가능)
+# - 캔들 차트용이라 LTTB(선 그래프용 대표점 선택) 대신 버킷별 open/high/low/close 집계 사용
+# - 저장: 원본 옆에 뷰 이름 "{base}@{points}" 인터벌로 같은 형식
+#   kline:1@500:json / kline:1@500:list:{sym} (IncrementalStore가 상위 봉과 같은 경로로 flush)
+import os
+from typing import Dict, List
+
+from kline_agg import BASE_INTERVAL, BASE_STEP_SEC
+
+KLINE_VIEW_POINTS = [
+    int(p) for p in os.getenv("KLINE_VIEW_POINTS", "500,1000").split(",") if p.strip().isdigit()
+]
+# coin_backfill.KEEP_1M과 같은 환경변수 (버킷 폭 기준)
+VIEW_BASE_KEEP = int(os.getenv("KEEP_1M", "10080"))
+
+
+def view_name(points: int, base_interval: str = BASE_INTERVAL) -> str:
+    return f"{base_interval}@{points}"
+
+
+# 뷰 이름 → 버킷 폭(초)
+VIEW_STEP_SEC: Dict[str, int] = {
+    view_name(points): -(-VIEW_BASE_KEEP // points) * BASE_STEP_SEC for points in KLINE_VIEW_POINTS
+}
+
+
+def view_keep_map(keep_base: int, points_list: List[int]) -> Dict[str, int]:
+    """{뷰 이름: 보관 개수} — 1분봉 keep_base개를 덮는 버킷 수 (KEEP_1M 기준이면 points 이하)"""
+    out = {}
+    for points in points_list:
+        name = view_name(points)
+        if name not in VIEW_STEP_SEC:
+            raise ValueError(f"unsupported view resolution: {points} (KLINE_VIEW_POINTS={KLINE_VIEW_POINTS})")
+        out[name] = max(1, -(-keep_base * BASE_STEP_SEC // VIEW_STEP_SEC[name]))
+    return out
@@ -0,0 +1,126 @@
+# kline_worker.py
+# Bybit kline 수집 워커 (main.py에서 시작)
+#
+# - 프로세스 공용 IncrementalStore(스레드 안전) 1개를 소유
+# - 인터벌별 전용 스레드: 봉 마감 시각 + SKEW_MS_1M / SKEW_MS_1D 에 맞춰 깨어나 증분 수집
+#   (Event.wait 타임아웃으로 대기 → 초 미만 정밀도, APScheduler 스레드 풀과 무관하게 동작)
+#   작업이 다음 마감을 넘기면 밀린 회차는 건너뛰고 다음 마감에 맞춤 (다음 수집이 last_ts부터 한꺼번에 가져옴)
+# - 1분봉 스레드는 KLINE_GAP_SCAN_MIN 분마다 갭 보수도 수행
+# - KLINE_WORKER_MODE=stream 이면 1분/1일 모두 WebSocket 스트림(kline_stream)으로 수집
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import List, Optional
+
+import kline_agg
+import kline_views
+from coin_backfill import (
+    IncrementalStore,
+    KEEP_1M, KEEP_1D, SKEW_MS_1M, SKEW_MS_1D,
+    step_ms, run_klines_minutely, run_klines_daily, run_gap_repair,
+)
+
+KLINE_SYMBOLS = [
+    s.strip().upper()
+    for s in os.getenv("KLINE_SYMBOLS", os.getenv("SYMBOLS", "")).split(",")
+    if s.strip()
+]
+KLINE_WORKER_MODE = os.getenv("KLINE_WORKER_MODE", "poll")  # poll | stream
+KLINE_GAP_SCAN_MIN = int(os.getenv("KLINE_GAP_SCAN_MIN", "60"))
+
+log = logging.getLogger("kline_worker")
+
+
+def next_fire_ms(now_ms: int, interval: str, skew_ms: int) -> int:
+    """now 이후 처음 오는 '봉 마감 + skew' 시각"""
+    step = step_ms(interval)
+    fire = (now_ms - skew_ms) // step * step + step + skew_ms
+    return fire
+
+
+class KlineWorker:
+    def __init__(
+        self,
+        symbols: List[str],
+        agg_intervals: Optional[List[str]] = None,
+        view_points: Optional[List[int]] = None,
+    ):
+        self.symbols = symbols
+        self.store = IncrementalStore(
+            keep_map={"1": KEEP_1M, "D": KEEP_1D},
+            agg_intervals=kline_agg.KLINE_AGG_INTERVALS if agg_intervals is None else agg_intervals,
+            view_points=kline_views.KLINE_VIEW_POINTS if view_points is None else view_points,
+        )
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._streamer = None
+
+    def start(self):
+        if KLINE_WORKER_MODE == "stream":
+            targets = [("kline-stream", self._stream_main, ())]
+        else:
+            targets = [
+                ("kline-1m", self._interval_main, ("1", SKEW_MS_1M, run_klines_minutely)),
+                ("kline-1d", self._interval_main, ("D", SKEW_MS_1D, run_klines_daily)),
+            ]
+        for name, target, args in targets:
+            t = threading.Thread(target=target, args=args, name=name, daemon=True)
+            t.start()
+            self._threads.append(t)
+        log.info("🪙 kline worker started (mode=%s, symbols=%d)", KLINE_WORKER_MODE, len(self.symbols))
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._loop is not None and self._streamer is not None:
+            self._loop.call_soon_threadsafe(self._streamer.stop)
+        for t in self._threads:
+            t.join(timeout)
+
+    # ── 폴링 모드: 인터벌별 스레드
+    def _initialize(self, interval: str):
+        try:
+            self.store.load_or_backfill(self.symbols, interval)
+            self.store.flush_interval(interval, self.symbols)
+        except Exception:
+            log.exception("❌ %s kline 초기화 실패 (다음 회차 증분 수집으로 진행)", interval)
+
+    def _interval_main(self, interval: str, skew_ms: int, job):
+        self._initialize(interval)
+        last_gap_scan = time.monotonic()
+        while not self._stop.is_set():
+            now_ms = int(time.time() * 1000)
+            fire = next_fire_ms(now_ms, interval, skew_ms)
+            if self._stop.wait((fire - now_ms) / 1000):
+                break
+            job(self.store, self.symbols)
+
+            if interval == "1" and KLINE_GAP_SCAN_MIN > 0 \
+                    and time.monotonic() - last_gap_scan >= KLINE_GAP_SCAN_MIN * 60:
+                last_gap_scan = time.monotonic()
+                run_gap_repair(self.store, self.symbols, interval)
+
+    # ── 스트림 모드
+    def _stream_main(self):
+        from kline_stream import KlineStreamer
+
+        for interval in ("1", "D"):
+            self._initialize(interval)
+        self._loop = asyncio.new_event_loop()
+        self._streamer = KlineStreamer(self.store, self.symbols, ["1", "D"])
+        try:
+            self._loop.run_until_complete(self._streamer.run())
+        finally:
+            self._loop.close()
+
+
+def start_kline_worker() -> Optional[KlineWorker]:
+    """KLINE_SYMBOLS(없으면 SYMBOLS)가 비어 있으면 시작하지 않음"""
+    if not KLINE_SYMBOLS:
+        log.info("⏭️ KLINE_SYMBOLS 비어 있음. kline worker 시작 안 함")
+        return None
+    worker = KlineWorker(KLINE_SYMBOLS)
+    worker.start()
+    return worker
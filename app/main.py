@@ -4,24 +4,34 @@ import time
 import signal
 import logging
 from datetime import datetime
-from pytz import timezone, utc
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-from apscheduler.executors.pool import ThreadPoolExecutor
-from persist import persist_today_data
-
-from storage import (
-    fetch_and_store_chart_data,
-    fetch_and_store_youtube_data,
-    fetch_and_store_holiday_data,
-    save_daily_data,
-)
-from 세계정세분석 import analyze_and_store_world_state
-from redis_client import redis_client
+from startup_profile import import_timer, report_imports, mark_first_job
+
+# 무거운 의존성(openai, supabase, pandas, whisper 등)은 각 모듈에서 실제 사용 시점에 import.
+# 여기서는 모듈별 import 시간만 측정 (STARTUP_PROFILE=1 이면 로그 출력)
+with import_timer("pytz/apscheduler"):
+    from pytz import timezone, utc
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.cron import CronTrigger
+    from apscheduler.executors.pool import ThreadPoolExecutor
+with import_timer("persist"):
+    from persist import persist_today_data
+
+with import_timer("storage"):
+    from storage import (
+        fetch_and_store_chart_data,
+        fetch_and_store_youtube_data,
+        fetch_and_store_holiday_data,
+        save_daily_data,
+    )
+with import_timer("세계정세분석"):
+    from 세계정세분석 import analyze_and_store_world_state
+with import_timer("redis_client"):
+    from redis_client import redis_client
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
 SEOUL = timezone("Asia/Seoul")
+report_imports(log)
 
 
 # Redis 클라이언트 이름(운영 트레이싱 편의)
@@ -130,6 +140,24 @@ def scheduled_store(run_all: bool = False):
     except Exception as e:
         log.exception("❌ scheduled_store 실행 중 예외: %s", e)
 
+# ───────────────────────────────────────────────────────────
+# Bybit kline 워커 (전용 스레드, APScheduler 풀과 분리)
+# ───────────────────────────────────────────────────────────
+def start_kline_worker():
+    """
+    봉 마감(+SKEW) 시각에 맞춰 도는 1m/1D kline 수집 스레드 시작.
+    유튜브/Whisper 작업이 도는 스케줄러 풀(5)과 스레드를 공유하지 않음.
+    시작 시 Redis 스냅샷 로드(없으면 전량 백필)도 워커 스레드에서 진행.
+    """
+    try:
+        with import_timer("kline_worker"):
+            from kline_worker import start_kline_worker as _start
+        return _start()
+    except Exception:
+        log.exception("❌ kline worker 시작 실패")
+        return None
+
+
 def startup_runs():
     now = datetime.now(SEOUL)
     scheduled_daily_min = 9 * 60 + 1
@@ -137,6 +165,7 @@ def startup_runs():
     run_daily_now = abs(cur_min - scheduled_daily_min) > 5
 
     log.info("🚀 Startup run: scheduled_store(run_all=True) + FULL kline initialize (closed-only)")
+    mark_first_job(log)
     try:
         scheduled_store(run_all=True)
 
@@ -171,6 +200,8 @@ def main():
     )
 
 
+    kline_worker = start_kline_worker()
+
     startup_runs()
 
     scheduler.start()
@@ -180,6 +211,8 @@ def main():
         log.info("🛑 Shutting down scheduler...")
         try:
             scheduler.shutdown(wait=False)
+            if kline_worker is not None:
+                kline_worker.stop()
         finally:
             sys.exit(0)
 
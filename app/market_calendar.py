@@ -0,0 +1,119 @@
+# market_calendar.py
+# 종목별 거래소 세션 캘린더
+#
+# 차트 수집 잡이 "마지막 동기화 이후 한 번도 장이 열리지 않은" 종목을 건너뛰는 데 사용.
+# - 거래소별 현지 시간 정규장 + 주말 제외
+# - 휴장일은 market_holidays(휴장일구하기.get_market_holidays 결과)에서 국가 코드로 조회
+# - 장 마감 후에도 KIS 일봉 확정이 늦을 수 있어 마감 후 CHART_SESSION_GRACE_MIN 분까지는 열린 것으로 취급
+import os
+import json
+from datetime import datetime, timedelta, time as dtime
+
+from pytz import timezone, utc
+
+SESSION_GRACE = timedelta(minutes=int(os.getenv("CHART_SESSION_GRACE_MIN", "180")))
+
+# 정규장: (시간대, 개장, 마감, 휴장일 국가코드)
+EXCHANGES = {
+    "KRX":   ("Asia/Seoul",     dtime(9, 0),   dtime(15, 30), "KR"),
+    "NYSE":  ("America/New_York", dtime(9, 30), dtime(16, 0), "US"),
+    "HKEX":  ("Asia/Hong_Kong", dtime(9, 30),  dtime(16, 0),  "HK"),
+    "SSE":   ("Asia/Shanghai",  dtime(9, 30),  dtime(15, 0),  "CN"),
+    "TSE":   ("Asia/Tokyo",     dtime(9, 0),   dtime(15, 30), "JP"),
+    "BSE":   ("Asia/Kolkata",   dtime(9, 15),  dtime(15, 30), None),
+    "XETRA": ("Europe/Berlin",  dtime(9, 0),   dtime(17, 30), "DE"),
+    "UST":   ("America/New_York", dtime(8, 0), dtime(17, 0),  "US"),
+}
+
+# 주 단위 연속 거래(일요일 개장 ~ 금요일 마감, 뉴욕 시간): (시간대, 일요일 개장, 금요일 마감)
+CONTINUOUS = {
+    "FX":        ("America/New_York", dtime(17, 0), dtime(17, 0)),
+    "COMMODITY": ("America/New_York", dtime(18, 0), dtime(17, 0)),
+}
+
+SYMBOL_MARKETS = {
+    "2001": "KRX",
+    "NDX": "NYSE",
+    "CH#SHA": "SSE",
+    "HK#HS": "HKEX",
+    "JP#NI225": "TSE",
+    "IN#BOMBAY": "BSE",
+    "SX5E": "XETRA",
+    "GR#DAX": "XETRA",
+    "Y0202": "UST",
+    "Y0207": "TSE",
+    "Y0101": "KRX",
+}
+
+CATEGORY_MARKETS = {
+    "currency": "FX",
+    "commodity": "COMMODITY",
+}
+
+
+def market_for(symbol, category):
+    """종목 → 시장 코드 (모르면 None → 항상 수집)"""
+    return SYMBOL_MARKETS.get(symbol) or CATEGORY_MARKETS.get(category)
+
+
+def parse_holidays(raw):
+    """market_holidays all_holidays JSON → {국가코드: {날짜 문자열}}"""
+    if not raw:
+        return {}
+    if isinstance(raw, (bytes, bytearray)):
+        raw = raw.decode()
+    data = json.loads(raw) if isinstance(raw, str) else raw
+    out = {}
+    for code, items in data.items():
+        if isinstance(items, list):  # 조회 실패 국가는 {"error": ...}
+            out[code] = {h["date"] for h in items if "date" in h}
+    return out
+
+
+def _sessions(market, start_utc, end_utc, holidays):
+    """[start_utc, end_utc] 근처의 (개장, 마감+grace) UTC 구간들"""
+    if market in CONTINUOUS:
+        tz_name, open_t, close_t = CONTINUOUS[market]
+        tz = timezone(tz_name)
+        day = start_utc.astimezone(tz).date() - timedelta(days=7)
+        last = end_utc.astimezone(tz).date()
+        while day <= last:
+            if day.weekday() == 6:  # 일요일 개장 → 금요일 마감
+                opened = tz.localize(datetime.combine(day, open_t))
+                closed = tz.localize(datetime.combine(day + timedelta(days=5), close_t))
+                yield opened.astimezone(utc), closed.astimezone(utc) + SESSION_GRACE
+            day += timedelta(days=1)
+        return
+
+    tz_name, open_t, close_t, country = EXCHANGES[market]
+    tz = timezone(tz_name)
+    closed_days = holidays.get(country, set()) if country else set()
+    day = start_utc.astimezone(tz).date() - timedelta(days=1)
+    last = end_utc.astimezone(tz).date()
+    while day <= last:
+        if day.weekday() < 5 and day.isoformat() not in closed_days:
+            opened = tz.localize(datetime.combine(day, open_t))
+            closed = tz.localize(datetime.combine(day, close_t))
+            yield opened.astimezone(utc), closed.astimezone(utc) + SESSION_GRACE
+        day += timedelta(days=1)
+
+
+def had_session_since(market, since_utc, now_utc=None, holidays=None):
+    """since_utc 이후 now까지 장이 (grace 포함) 한 번이라도 열려 있었는지"""
+    now_utc = now_utc or datetime.now(utc)
+    for opened, closed in _sessions(market, since_utc, now_utc, holidays or {}):
+        if opened <= now_utc and closed > since_utc:
+            return True
+    return False
+
+
+def should_skip(symbol, category, synced_at, now_utc=None, holidays=None):
+    """
+    마지막 동기화(synced_at, UTC "%Y-%m-%dT%H:%M:%SZ") 이후 장이 열린 적 없으면 True.
+    시장을 모르거나 동기화 기록이 없으면 False(수집).
+    """
+    market = market_for(symbol, category)
+    if market is None or not synced_at:
+        return False
+    since = utc.localize(datetime.strptime(synced_at, "%Y-%m-%dT%H:%M:%SZ"))
+    return not had_session_since(market, since, now_utc, holidays)
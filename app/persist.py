@@ -6,7 +6,6 @@ from datetime import datetime, time, date, timedelta
 
 import requests
 from pytz import timezone
-from supabase import create_client
 
 from redis_client import redis_client
 
@@ -15,6 +14,10 @@ log = logging.getLogger(__name__)
 
 SEOUL = timezone("Asia/Seoul")
 
+# stream ID(XADD 시각)가 기록의 ts_ms보다 늦을 수 있어 day_end 이후로 조금 더 읽음 (ts_ms 필터가 최종 판정)
+TRADE_RECORD_ID_SLACK_MS = int(os.getenv("TRADE_RECORD_ID_SLACK_MS", "300000"))
+STREAM_PAGE_SIZE = int(os.getenv("STREAM_PAGE_SIZE", "1000"))
+
 
 def decode_val(v):
     if isinstance(v, (bytes, bytearray)):
@@ -37,6 +40,27 @@ def decode_hash(h):
     return out
 
 
+def xrange_window(key, start_ms, end_ms, page_size=STREAM_PAGE_SIZE):
+    """
+    stream ID가 [start_ms, end_ms) 인 항목 전부를 오래된 순으로 읽음.
+    stream ID는 ms 타임스탬프라 XRANGE start_ms-0 ~ (end_ms-1) 범위를 page_size씩 커서로 넘김.
+    """
+    rows = []
+    cursor = f"{start_ms}-0"
+    end = str(end_ms - 1)  # 시퀀스 없는 max → 해당 ms의 마지막 시퀀스까지 포함
+
+    while True:
+        page = redis_client.xrange(key, min=cursor, max=end, count=page_size)
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+
+        last_id = page[-1][0]
+        last_id = last_id.decode() if isinstance(last_id, (bytes, bytearray)) else str(last_id)
+        ms, seq = last_id.split("-")
+        cursor = f"{ms}-{int(seq) + 1}"
+
+
 def normalize_reasons(value):
     if isinstance(value, str):
         try:
@@ -213,6 +237,8 @@ def get_supabase():
     if not url or not key:
         raise RuntimeError("SUPABASE_URL / SUPABASE_SECRET_KEY 환경변수가 필요함")
 
+    # supabase 클라이언트는 import가 무거워서 실제 저장 시점에만 로드
+    from supabase import create_client
     return create_client(url, key)
 
 
@@ -567,11 +593,10 @@ def persist_today_data(
     trade_record_key = "trading:agent:CopyZannavi:u7c9f14d2a1:BYBIT:trade_records"
 
     try:
-        trade_records_raw = redis_client.xrevrange(
+        trade_records_raw = xrange_window(
             trade_record_key,
-            max="+",
-            min="-",
-            count=5000,
+            int(day_start.timestamp() * 1000),
+            int(day_end.timestamp() * 1000) + TRADE_RECORD_ID_SLACK_MS,
         )
     except Exception as e:
         log.warning("⚠️ trade_records 읽기 실패 key=%s err=%s", trade_record_key, e)
@@ -0,0 +1,70 @@
+# rate_limit.py
+# 외부 API 초당 요청 제한용 토큰 버킷 (스레드 안전)
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    rate: 초당 충전되는 토큰 수(= 초당 최대 요청 수)
+    capacity: 버킷 크기(순간 버스트 허용량). 기본 1 → 요청 간격을 1/rate 초로 고르게 유지
+    """
+
+    def __init__(self, rate, capacity=1):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.capacity = float(max(1, capacity))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def acquire(self, tokens=1):
+        """토큰이 생길 때까지 대기 후 소비."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveBucket(TokenBucket):
+    """
+    TokenBucket + 응답 헤더 기반 감속.
+    서버가 알려준 남은 요청 수가 reserve 이하로 떨어지면 reset 시각까지 새 요청을 보류.
+    (헤더가 없는 응답이면 고정 rate로만 동작)
+    """
+
+    def __init__(self, rate, capacity=1, reserve=2):
+        super().__init__(rate, capacity)
+        self.reserve = reserve
+        self._blocked_until = 0.0  # time.monotonic() 기준
+
+    def observe(self, remaining, reset_at_epoch_sec):
+        """remaining: 남은 요청 수, reset_at_epoch_sec: 한도 초기화 시각(epoch 초)"""
+        if remaining is None or reset_at_epoch_sec is None or remaining > self.reserve:
+            return
+        wait = reset_at_epoch_sec - time.time()
+        if wait <= 0:
+            return
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + wait)
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                wait = self._blocked_until - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        super().acquire(tokens)
@@ -0,0 +1,57 @@
+# startup_profile.py
+# 시작 시간 측정 (main.py 전용, 표준 라이브러리만 사용)
+#
+# - import_timer(name): main.py의 모듈 import마다 소요 시간과 새로 로드된 최상위 패키지 기록
+# - mark_first_job(log): 첫 작업 시작까지 걸린 시간(time-to-first-job) 기록
+# - STARTUP_PROFILE=1 이면 모듈별 import 시간과 끌려온 패키지 목록을 로그로 출력
+# - STARTUP_BUDGET_MS > 0 이면 time-to-first-job이 예산을 넘을 때 경고
+#   (패키지 내부까지 자세히 보려면 PYTHONPROFILEIMPORTTIME=1 로 실행)
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "0") == "1"
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "0"))
+
+_T0 = time.perf_counter()
+_records = []  # (module name, elapsed ms, [newly loaded top-level packages])
+_first_job_ms = None
+
+
+def _top_level(names):
+    return {n.split(".", 1)[0] for n in names}
+
+
+@contextmanager
+def import_timer(name):
+    before = set(sys.modules)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        pulled = sorted(_top_level(set(sys.modules) - before) - _top_level(before))
+        _records.append((name, elapsed_ms, pulled))
+
+
+def report_imports(log):
+    if not STARTUP_PROFILE:
+        return
+    total = sum(ms for _, ms, _ in _records)
+    log.info("⏱️ startup imports total=%.1f ms (since process start %.1f ms)",
+             total, (time.perf_counter() - _T0) * 1000)
+    for name, ms, pulled in sorted(_records, key=lambda r: r[1], reverse=True):
+        log.info("⏱️   %-24s %8.1f ms  +%s", name, ms, ",".join(pulled) or "-")
+
+
+def mark_first_job(log):
+    """첫 작업 시작 시 1회 호출"""
+    global _first_job_ms
+    if _first_job_ms is not None:
+        return
+    _first_job_ms = (time.perf_counter() - _T0) * 1000
+    if STARTUP_PROFILE:
+        log.info("⏱️ time-to-first-job %.1f ms", _first_job_ms)
+    if STARTUP_BUDGET_MS > 0 and _first_job_ms > STARTUP_BUDGET_MS:
+        log.warning("⚠️ time-to-first-job %.1f ms > budget %.0f ms", _first_job_ms, STARTUP_BUDGET_MS)
@@ -1,11 +1,17 @@
 import json
 from URL과요약문만들기 import get_latest_video_data, summarize_content, get_transcript_text, render_summary_text
-from 지수정보가져오기 import fetch_stock_info, calculate_dxy_from_currency_data, get_access_token
+from 지수정보가져오기 import (
+    sync_stock_info, calculate_dxy_from_currency_data, get_access_token, FetchCache, DXY_CURRENCY_SYMBOLS,
+    finish_indicators, is_pending_indicators,
+)
 from 휴장일구하기 import get_market_holidays
 from urllib.parse import urlparse, parse_qs
 from pytz import timezone, utc
 from redis_client import redis_client
+import chart_store
+import market_calendar
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from test_config import ALL_SYMBOLS, channels
 import os
 from pathlib import Path
@@ -17,6 +23,10 @@ load_dotenv(dotenv_path=env_path)
 KIS_APP_KEY = os.getenv("KIS_APP_KEY")
 KIS_APP_SECRET = os.getenv("KIS_APP_SECRET")
 CACHE_PATH = Path(__file__).resolve().parent / "token_cache.json"
+# 차트 수집 동시 실행 스레드 수 (요청 속도 자체는 KIS 토큰 버킷이 제한)
+CHART_FETCH_WORKERS = int(os.getenv("CHART_FETCH_WORKERS", "8"))
+# 거래 세션 기준으로 휴장 중인 종목 조회 생략 (0이면 매시간 전 종목 조회)
+CHART_MARKET_AWARE = os.getenv("CHART_MARKET_AWARE", "1") == "1"
 
 def convert_to_kst(published_utc_str):
     seoul_tz = timezone("Asia/Seoul")
@@ -132,49 +142,120 @@ def fetch_and_store_youtube_data():
 def fetch_and_store_chart_data():
     results = []
     token = get_access_token(KIS_APP_KEY, KIS_APP_SECRET)
-    # ALL_SYMBOLS에 정의된 각각의 카테고리별로 처리
-    for source, symbol_dict in ALL_SYMBOLS.items():
-        for category, symbols in symbol_dict.items():
-            source_data = {}
-            if category =='currency':
-                new_data = calculate_dxy_from_currency_data(token)
-                source_data['dxy'] = new_data
-                results.append(
-                    f"✅ [{source.upper()} - {category.upper()} - {'dxy'.upper()}] {len(new_data['data'])}개 데이터 수집 완료")
-            for name, symbol in symbols.items():
+    # 이번 실행 동안만 쓰는 조회 캐시 (DXY가 받은 환율을 currency 종목이 재사용)
+    cache = FetchCache()
+    now_utc = datetime.now(utc)
+    holidays = _load_market_holidays() if CHART_MARKET_AWARE else {}
+
+    # 1) 카테고리별 기존 데이터 조회 + 종목별 수집 작업을 스레드풀에 한꺼번에 등록
+    #    (KIS 초당 요청 제한은 지수정보가져오기.KIS_BUCKET이 전체 스레드에 걸쳐 적용)
+    jobs = []  # (source, category, stored_data, [(name, future), ...])
+    with ThreadPoolExecutor(max_workers=CHART_FETCH_WORKERS, thread_name_prefix="chart") as pool:
+        # ALL_SYMBOLS에 정의된 각각의 카테고리별로 처리
+        for source, symbol_dict in ALL_SYMBOLS.items():
+            for category, symbols in symbol_dict.items():
+                # 증분 동기화 기준이 되는 기존 저장 데이터
                 try:
-                    # fetch_stock_info 호출 시, symbol과 source 전달
-                    new_data = fetch_stock_info(symbol, token, category,source=source, day_num=200)
-                    source_data[name] = new_data
+                    stored_data = chart_store.load_category(category)
+                except Exception as e:
+                    print(f"⚠️ {category} 기존 chart_data 조회 실패, 전체 조회로 진행: {e}")
+                    stored_data = {}
+
+                # 마지막 동기화 이후 장이 열린 적 없는 종목은 조회 생략
+                skipped = set()
+                if CHART_MARKET_AWARE:
+                    try:
+                        names = list(symbols) + (['dxy'] if category == 'currency' else [])
+                        sync_times = chart_store.load_sync_times(category, names)
+                        for name in names:
+                            symbol = symbols.get(name, name)  # dxy는 카테고리(FX) 기준
+                            if market_calendar.should_skip(symbol, category, sync_times.get(name), now_utc, holidays):
+                                skipped.add(name)
+                    except Exception as e:
+                        print(f"⚠️ {category} 휴장 판단 실패, 전체 종목 수집: {e}")
+                        skipped = set()
+
+                futures = []
+                dxy_future = None
+                if category == 'currency':
+                    if 'dxy' not in skipped:
+                        dxy_future = pool.submit(calculate_dxy_from_currency_data, token, cache=cache)
+                    futures.append(('dxy', dxy_future))
+                for name, symbol in symbols.items():
+                    if name in skipped:
+                        futures.append((name, None))
+                        continue
+                    # 저장된 마지막 날짜 이후만 조회 (콜드 스타트/갭이면 전체 조회)
+                    # 지표는 카테고리 결과가 다 모인 뒤 finish_indicators로 한 번에 계산
+                    kwargs = dict(source=source, existing=stored_data.get(name), day_num=200, cache=cache,
+                                  defer_indicators=True)
+                    if dxy_future is not None and symbol in DXY_CURRENCY_SYMBOLS.values():
+                        # DXY가 받은 환율이 캐시에 들어간 뒤 그 데이터로 동기화
+                        futures.append((name, pool.submit(
+                            _sync_after, dxy_future, symbol, token, category, **kwargs)))
+                    else:
+                        futures.append((name, pool.submit(sync_stock_info, symbol, token, category, **kwargs)))
+                jobs.append((source, category, stored_data, futures))
+
+        # 2) 등록 순서대로 결과 수집 → 카테고리 단위 저장 (결과 메시지 순서는 기존과 동일)
+        for source, category, stored_data, futures in jobs:
+            outcomes = []  # (name, 결과 또는 예외 또는 None(조회 생략))
+            for name, future in futures:
+                if future is None:
+                    outcomes.append((name, None))
+                    continue
+                try:
+                    outcomes.append((name, future.result()))
+                except Exception as e:
+                    outcomes.append((name, e))
+
+            # 카테고리 종목들의 지표를 2차원 배열 한 번으로 계산 (DXY는 이미 계산된 결과)
+            pending = [(i, r) for i, (_, r) in enumerate(outcomes) if is_pending_indicators(r)]
+            try:
+                for (i, _), done in zip(pending, finish_indicators([r for _, r in pending])):
+                    outcomes[i] = (outcomes[i][0], done)
+            except Exception as e:
+                for i, _ in pending:
+                    outcomes[i] = (outcomes[i][0], e)
 
+            source_data = {}
+            for name, new_data in outcomes:
+                if new_data is None:
+                    results.append(f"⏭️ [{source.upper()} - {category.upper()} - {name.upper()}] 마지막 동기화 이후 장 열린 적 없음, 조회 생략")
+                elif isinstance(new_data, Exception):
+                    results.append(f"❌ [{source.upper()} - {category.upper()} - {name.upper()}] 수집 중 오류 발생: {str(new_data)}")
+                else:
+                    source_data[name] = new_data
                     results.append(f"✅ [{source.upper()} - {category.upper()} - {name.upper()}] {len(new_data['data'])}개 데이터 수집 완료")
-                except Exception as e:
-                    results.append(f"❌ [{source.upper()} - {category.upper()} - {name.upper()}] 수집 중 오류 발생: {str(e)}")
 
             try:
-                # Redis에 저장할 데이터 형식
-                redis_key = "chart_data"
-                 # 기존 데이터를 Redis에서 조회하여 비교
-                existing_data_raw = redis_client.hget(redis_key, category)
-                existing_data = json.loads(existing_data_raw.decode()) if existing_data_raw else {}
-
-                updated_data = existing_data.copy()
-                updated_data.update(source_data)  # 성공적으로 수집된 name만 덮어씀
-
-                existing_data_str = json.dumps(existing_data, sort_keys=True)
-                new_data_str = json.dumps(updated_data, sort_keys=True)
-                if existing_data_str == new_data_str:
+                # digest가 바뀐 종목만 저장
+                changed = chart_store.store_changed(category, source_data, stored_data)
+                if not changed:
                     results.append(f"⏭️ {category.upper()} 데이터 변경 없음, 저장 생략")
                 else:
-                    processed_time = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-                    redis_client.hset(redis_key, category + "_processed_time", processed_time)
-                    redis_client.hset(redis_key, category, new_data_str)
-                    results.append(f"✅ 전체 {category.upper()} 데이터 Redis에 저장 완료")
+                    results.append(f"✅ {category.upper()} 변경 {len(changed)}개 종목 Redis에 저장 완료 ({', '.join(changed)})")
 
             except Exception as e:
                 results.append(f"❌ 전체 {category.upper()} 데이터 저장 중 오류 발생: {str(e)}")
+    results.append(f"♻️ 조회 캐시 재사용 {cache.hits}회 / KIS 조회 {cache.misses}회")
     return "\n".join(results)
 
+def _load_market_holidays():
+    try:
+        return market_calendar.parse_holidays(redis_client.hget("market_holidays", "all_holidays"))
+    except Exception as e:
+        print(f"⚠️ market_holidays 조회 실패, 주말만 휴장으로 처리: {e}")
+        return {}
+
+def _sync_after(dependency, symbol, token, category, **kwargs):
+    """dependency(Future) 완료를 기다린 뒤 동기화 (실패해도 캐시 없이 그대로 진행)"""
+    try:
+        dependency.result()
+    except Exception:
+        pass
+    return sync_stock_info(symbol, token, category, **kwargs)
+
 def fetch_and_store_holiday_data():
     results = []
     try:
@@ -21,14 +21,23 @@ from datetime import datetime, timedelta
 
 from pytz import timezone
 from dotenv import load_dotenv
-from openai import OpenAI
 
 from redis_client import redis_client
 
 env_path = Path(__file__).resolve().parent / ".env"
 load_dotenv(dotenv_path=env_path)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+
+# OpenAI 클라이언트는 분석 실행 시점에 생성 (import 비용을 시작 시점에서 제외)
+_openai_client = None
+
+
+def _get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+        _openai_client = OpenAI(api_key=OPENAI_API_KEY)
+    return _openai_client
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 log = logging.getLogger(__name__)
@@ -248,7 +257,7 @@ def _analyze_one_country(country: str, items: list) -> dict:
     else:
         text = "(최근 뉴스 요약 없음)"
 
-    completion = openai_client.chat.completions.create(
+    completion = _get_openai_client().chat.completions.create(
         model="gpt-4.1-mini",
         messages=[
             {"role": "system", "content": _COUNTRY_PROMPT_TMPL.replace("__C__", country)},
@@ -265,7 +274,7 @@ def _analyze_one_country(country: str, items: list) -> dict:
 def _analyze_relations(per_country: dict) -> list:
     """reduce: 7개국 전체를 보고 양자 관계만 종합."""
     input_text = _build_input_text(per_country)
-    completion = openai_client.chat.completions.create(
+    completion = _get_openai_client().chat.completions.create(
         model="gpt-4.1-mini",
         messages=[
             {"role": "system", "content": RELATIONS_PROMPT},
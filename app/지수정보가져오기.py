@@ -1,83 +1,42 @@
-import time
 from datetime import datetime, UTC
-import pandas as pd
 from pathlib import Path
 from dotenv import load_dotenv
 import requests
 import os
-import json
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from indicators import compute_indicators, batch_indicators, attach_indicators, MA_KEY, ENVELOPES
+from rate_limit import TokenBucket
+from kis_token import get_token_manager
+import chart_store
 # 환경변수 불러오기
 env_path = Path(__file__).resolve().parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
 KIS_APP_KEY = os.getenv("KIS_APP_KEY")
 KIS_APP_SECRET = os.getenv("KIS_APP_SECRET")
-CACHE_PATH = Path(__file__).resolve().parent / "token_cache.json"
 
+# 증분 동기화: 저장된 마지막 날짜 이후만 조회 (0이면 매번 1년치 전체 조회)
+CHART_INCREMENTAL_SYNC = os.getenv("CHART_INCREMENTAL_SYNC", "1") == "1"
+# 마지막 저장일이 이보다 오래됐으면 증분 대신 전체 조회
+CHART_SYNC_MAX_GAP_DAYS = int(os.getenv("CHART_SYNC_MAX_GAP_DAYS", "30"))
 
-def calculate_moving_average(data, period=100):
-    result = []
-    for i in range(len(data)):
-        if i < period:
-            pass
-        else:
-            avg = sum(d["close"] for d in data[i - period + 1:i + 1]) / period
-            result.append(avg)
-    return result
+# KIS 초당 요청 제한(실전 계정 20건/초) → 여유를 두고 토큰 버킷으로 전체 프로세스 공유
+KIS_MAX_RPS = float(os.getenv("KIS_MAX_RPS", "15"))
+KIS_BUCKET = TokenBucket(rate=KIS_MAX_RPS)
 
-def calculate_envelope(moving_avg, percentage):
-    upper = []
-    lower = []
-    for avg in moving_avg:
-        upper.append(avg * (1 + percentage))
-        lower.append(avg * (1 - percentage))
-    return upper, lower
-
-def load_cached_token():
-    if CACHE_PATH.exists():
-        with open(CACHE_PATH, "r") as f:
-            cache = json.load(f)
-            expires_at = datetime.fromisoformat(cache["expires_at"])
-            if datetime.now() < expires_at:
-                return cache["access_token"]
-    return None
-
-def save_token_to_cache(access_token, expires_at_str):
-    # 문자열 → datetime 객체
-    expires_at = datetime.strptime(expires_at_str, "%Y-%m-%d %H:%M:%S")
-    with open(CACHE_PATH, "w") as f:
-        json.dump({
-            "access_token": access_token,
-            "expires_at": expires_at.isoformat()
-        }, f)
+# 일봉 페이지(120일 구간) 동시 조회
+KIS_PARALLEL_PAGES = os.getenv("KIS_PARALLEL_PAGES", "1") == "1"
+KIS_PAGE_DAYS = 120
+KIS_PAGE_MAX_ROWS = 100  # KIS 일봉 1회 응답 최대 건수
+KIS_PAGE_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("KIS_PAGE_WORKERS", "4")), thread_name_prefix="kis-page")
 
-def get_access_token(KIS_APP_KEY,KIS_APP_SECRET ):
-    cached_token = load_cached_token()
-    if cached_token:
-        print("✅ Using cached access token.")
-        return cached_token
-
-    print("🔐 Requesting new access token...")
-    url = "https://openapi.koreainvestment.com:9443/oauth2/tokenP"
-    headers = {"Content-Type": "application/json; charset=UTF-8"}
-    body = {
-        "grant_type": "client_credentials",
-        "appkey": KIS_APP_KEY,
-        "appsecret": KIS_APP_SECRET
-    }
-
-    response = requests.post(url, headers=headers, json=body)
-    response.raise_for_status()
-    data = response.json()
-    access_token = data["access_token"]
-    expires_at_str = data.get("access_token_token_expired")
-    if not expires_at_str:
-        # 만료 시간 정보가 없을 경우 24시간 유효
-        expires_at_str = (datetime.now() + timedelta(hours=24)).strftime("%Y-%m-%d %H:%M:%S")
 
-    save_token_to_cache(access_token, expires_at_str)
-    return access_token
+def get_access_token(KIS_APP_KEY,KIS_APP_SECRET ):
+    # 메모리 → Redis 공유 캐시 → 발급(분산 락으로 한 프로세스만) 순서 (kis_token 참고)
+    return get_token_manager(KIS_APP_KEY, KIS_APP_SECRET).get()
 
 def process_row_data(row, field_map, volume_key="acml_vol", extra_fields=None):
     """공통적인 row 처리 함수"""
@@ -90,20 +49,161 @@ def process_row_data(row, field_map, volume_key="acml_vol", extra_fields=None):
         "volume": safe_int(row.get(volume_key, 0)),
         **(extra_fields or {})
     }
-def fetch_stock_or_index_prices(symbol,token,category="index", source="domestic", num_days=200):
+class FetchCache:
+    """
+    차트 수집 1회 실행 동안만 유지되는 KIS 조회 결과 캐시.
+    key = (source, symbol, market_code, start yyyymmdd, end yyyymmdd)
+    - 같은 키는 그대로 재사용
+    - 더 넓은 구간을 이미 받아둔 경우(예: DXY가 받은 1년치 환율)는 잘라서 재사용
+    - 같은 종목을 여러 스레드가 동시에 요청하면 한 번만 조회
+    """
+
+    def __init__(self):
+        self._entries = {}  # (source, symbol, market_code) → [(start, end, num_days, rows)]
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _symbol_lock(self, base_key):
+        with self._lock:
+            return self._locks.setdefault(base_key, threading.Lock())
+
+    def _lookup(self, base_key, start, end, num_days):
+        for c_start, c_end, c_num_days, rows in self._entries.get(base_key, []):
+            if c_start > start or c_end != end:
+                continue
+            if c_start == start and c_num_days >= num_days:
+                return rows[-num_days:]
+            # 앞부분이 num_days로 잘린 캐시는 요청 시작일까지 덮는 경우만 사용
+            trimmed = len(rows) >= c_num_days
+            if trimmed and (not rows or rows[0]["date"].replace("-", "") > start):
+                continue
+            sub = [r for r in rows if r["date"].replace("-", "") >= start]
+            return sub[-num_days:]
+        return None
+
+    def get_or_fetch(self, key, num_days, fetch):
+        source, symbol, market_code, start, end = key
+        base_key = (source, symbol, market_code)
+        with self._symbol_lock(base_key):
+            rows = self._lookup(base_key, start, end, num_days)
+            if rows is None:
+                self.misses += 1
+                rows = fetch()
+                self._entries.setdefault(base_key, []).append((start, end, num_days, rows))
+            else:
+                self.hits += 1
+        # 호출 측에서 지표 등을 덧붙이므로 복사본 반환
+        return [dict(r) for r in rows]
+
+def kis_market_code(source, category):
+    if source == "domestic":
+        return "J"
+    if source == "dmr":
+        return "U"
+    if category == "currency":
+        return "X"
+    if category == "treasury":
+        return "I"
+    return "N"
+
+def kis_get(url, headers, params):
+    """KIS GET 요청 (토큰 버킷으로 초당 요청 수 제한)"""
+    KIS_BUCKET.acquire()
+    response = requests.get(url, headers=headers, params=params)
+    response.raise_for_status()
+    return response.json()
+
+def _fetch_kis_window(url, headers, params, current_start, current_end):
+    page_params = dict(params)
+    page_params["FID_INPUT_DATE_1"] = current_start.strftime("%Y%m%d")
+    page_params["FID_INPUT_DATE_2"] = current_end.strftime("%Y%m%d")
+    data = kis_get(url, headers, page_params)
+    return data.get('output2') or []
+
+def _fetch_kis_pages_serial(url, headers, params, start_date, end_date):
+    """최신 → 과거로 120일씩, 직전 응답의 가장 오래된 날짜를 기준으로 다음 구간 요청"""
+    all_data = []
+    current_end = end_date
+    while True:
+        current_start = current_end - timedelta(days=KIS_PAGE_DAYS)  # 넉넉히 120일 간격 (휴장일 고려)
+        if current_start < start_date:
+            current_start = start_date
+
+        rows = _fetch_kis_window(url, headers, params, current_start, current_end)
+        if not rows:
+            break  # 더 이상 데이터가 없으면 종료
+
+        all_data.extend(rows)
+
+        # 가장 오래된 날짜에서 하루 전으로 다음 루프 설정
+        oldest = min(rows, key=lambda x: x['stck_bsop_date'])
+        current_end = datetime.strptime(oldest['stck_bsop_date'], "%Y%m%d") - timedelta(days=1)
+
+        if current_end < start_date:
+            break
+    return all_data
+
+def plan_kis_windows(start_date, end_date):
+    """[start_date, end_date]를 최신 → 과거 순 120일 구간들로 분할"""
+    windows = []
+    current_end = end_date
+    while current_end >= start_date:
+        current_start = max(start_date, current_end - timedelta(days=KIS_PAGE_DAYS))
+        windows.append((current_start, current_end))
+        current_end = current_start - timedelta(days=1)
+    return windows
+
+def fetch_kis_daily_pages(url, headers, params, start_date, end_date):
+    """
+    KIS 일봉 구간 조회 (stck_bsop_date 기준 중복 제거, 순서 무관)
+    - KIS_PARALLEL_PAGES=1: 구간을 미리 나눠 동시에 요청 (초당 제한은 KIS_BUCKET이 적용)
+      한 응답이 최대 건수로 잘렸으면 그 구간의 남은 앞부분만 순차로 보충
+    - 0 또는 구간이 하나뿐이면 기존 순차 페이지네이션
+    """
+    windows = plan_kis_windows(start_date, end_date)
+    if not KIS_PARALLEL_PAGES or len(windows) <= 1:
+        return _fetch_kis_pages_serial(url, headers, params, start_date, end_date)
+
+    futures = [
+        KIS_PAGE_POOL.submit(_fetch_kis_window, url, headers, params, w_start, w_end)
+        for w_start, w_end in windows
+    ]
+    by_date = {}
+    for (w_start, _), future in zip(windows, futures):
+        rows = future.result()
+        for row in rows:
+            by_date[row['stck_bsop_date']] = row
+        if len(rows) >= KIS_PAGE_MAX_ROWS:
+            oldest = min(rows, key=lambda x: x['stck_bsop_date'])
+            rest_end = datetime.strptime(oldest['stck_bsop_date'], "%Y%m%d") - timedelta(days=1)
+            if rest_end >= w_start:
+                for row in _fetch_kis_pages_serial(url, headers, params, w_start, rest_end):
+                    by_date[row['stck_bsop_date']] = row
+    return list(by_date.values())
+
+def fetch_stock_or_index_prices(symbol,token,category="index", source="domestic", num_days=200, start_date=None, cache=None):
     # 오늘 날짜와 200일 전 날짜 계산
-    time.sleep(0.5)
+    # start_date를 주면(증분 동기화) 그 날짜부터만 조회, 없으면 1년치 전체 조회
+    # cache(FetchCache)를 주면 같은 실행 안에서 이미 받은 구간은 재사용
     today = datetime.today()
-    start_date = (today - timedelta(days=365))  # 1년 전
+    if start_date is None:
+        start_date = (today - timedelta(days=365))  # 1년 전
     end_date = today# 오늘
 
+    if cache is not None and source in ("domestic", "dmr", "overseas"):
+        key = (source, symbol, kis_market_code(source, category),
+               start_date.strftime("%Y%m%d"), end_date.strftime("%Y%m%d"))
+        return cache.get_or_fetch(key, num_days, lambda: fetch_stock_or_index_prices(
+            symbol, token, category=category, source=source, num_days=num_days, start_date=start_date))
+
     if source == "domestic":
         # 국내 주식/지수의 경우
         url = "https://openapi.koreainvestment.com:9443/uapi/domestic-stock/v1/quotations/inquire-daily-itemchartprice"
         tr_id = "FHKST03010100"
         market_code = "J"
 
-        current_end = end_date
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {token}",
@@ -112,44 +212,19 @@ def fetch_stock_or_index_prices(symbol,token,category="index", source="domestic"
             "tr_id": tr_id,
             "custtype": "P"
         }
-        all_data = []
-
-        while True:
-            current_start = current_end - timedelta(days=120)  # 넉넉히 120일 간격 (휴장일 고려)
-            if current_start < start_date:
-                current_start = start_date
-
-            params = {
-                "FID_COND_MRKT_DIV_CODE": market_code,
-                "FID_INPUT_ISCD": symbol,
-                "FID_INPUT_DATE_1": current_start.strftime("%Y%m%d"),
-                "FID_INPUT_DATE_2": current_end.strftime("%Y%m%d"),
-                "FID_ORG_ADJ_PRC": "0",
-                "FID_PERIOD_DIV_CODE": "D"
-            }
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            # JSON 데이터 반환
-            data = response.json()
-            if 'output2' not in data or not data['output2']:
-                break  # 더 이상 데이터가 없으면 종료
-
-            all_data.extend(data['output2'])
-
-            # 가장 오래된 날짜에서 하루 전으로 다음 루프 설정
-            oldest = min(data['output2'], key=lambda x: x['stck_bsop_date'])
-            current_end = datetime.strptime(oldest['stck_bsop_date'], "%Y%m%d") - timedelta(days=1)
-
-            if current_end < start_date:
-                break
-        data = {'output2':all_data}
+        params = {
+            "FID_COND_MRKT_DIV_CODE": market_code,
+            "FID_INPUT_ISCD": symbol,
+            "FID_ORG_ADJ_PRC": "0",
+            "FID_PERIOD_DIV_CODE": "D"
+        }
+        data = {'output2': fetch_kis_daily_pages(url, headers, params, start_date, end_date)}
 
     elif source == "dmr":
         # 국내 주식/지수의 경우
         url = "https://openapi.koreainvestment.com:9443/uapi/domestic-stock/v1/quotations/inquire-daily-indexchartprice"
         tr_id = "FHKUP03500100"
 
-        current_end = end_date
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {token}",
@@ -158,51 +233,18 @@ def fetch_stock_or_index_prices(symbol,token,category="index", source="domestic"
             "tr_id": tr_id,
             "custtype": "P"
         }
-        all_data = []
         market_code = 'U'
-        while True:
-            current_start = current_end - timedelta(days=120)  # 넉넉히 120일 간격 (휴장일 고려)
-            if current_start < start_date:
-                current_start = start_date
-
-            params = {
-                "FID_COND_MRKT_DIV_CODE": market_code,
-                "FID_INPUT_ISCD": symbol,
-                "FID_INPUT_DATE_1": current_start.strftime("%Y%m%d"),
-                "FID_INPUT_DATE_2": current_end.strftime("%Y%m%d"),
-                "FID_PERIOD_DIV_CODE": "D"
-            }
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            # JSON 데이터 반환
-            data = response.json()
-            if 'output2' not in data or not data['output2']:
-                break  # 더 이상 데이터가 없으면 종료
-
-            all_data.extend(data['output2'])
-
-            # 가장 오래된 날짜에서 하루 전으로 다음 루프 설정
-            oldest = min(data['output2'], key=lambda x: x['stck_bsop_date'])
-            current_end = datetime.strptime(oldest['stck_bsop_date'], "%Y%m%d") - timedelta(days=1)
-
-            if current_end < start_date:
-                break
-        data = {'output2': all_data}
+        params = {
+            "FID_COND_MRKT_DIV_CODE": market_code,
+            "FID_INPUT_ISCD": symbol,
+            "FID_PERIOD_DIV_CODE": "D"
+        }
+        data = {'output2': fetch_kis_daily_pages(url, headers, params, start_date, end_date)}
 
     elif source == "overseas":
         url = "https://openapi.koreainvestment.com:9443/uapi/overseas-price/v1/quotations/inquire-daily-chartprice"
         tr_id = "FHKST03030100"
-        if category=="index":
-            market_code = "N"
-        elif category=="currency":
-            market_code = "X"
-        elif category=="treasury":
-            market_code = "I"
-        elif category == "commodity":
-            market_code = "N"
-        else:
-            market_code = "N"
-        current_end = datetime.today()
+        market_code = kis_market_code(source, category)
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {token}",
@@ -211,35 +253,13 @@ def fetch_stock_or_index_prices(symbol,token,category="index", source="domestic"
             "tr_id": tr_id,
             "custtype": "P"
         }
-        all_data = []
-        while True:
-            current_start = current_end - timedelta(days=120)  # 넉넉히 120일 간격 (휴장일 고려)
-            if current_start < start_date:
-                current_start = start_date
-
-            params = {
-                "FID_COND_MRKT_DIV_CODE": market_code,
-                "FID_INPUT_ISCD": symbol,
-                "FID_INPUT_DATE_1": current_start.strftime("%Y%m%d"),
-                "FID_INPUT_DATE_2": current_end.strftime("%Y%m%d"),
-                "FID_PERIOD_DIV_CODE": "D"
-            }
-        # API 호출
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-        # JSON 데이터 반환
-            data = response.json()
-            if 'output2' not in data or not data['output2']:
-                break  # 더 이상 데이터가 없으면 종료
-            all_data.extend(data['output2'])
-
-            # 가장 오래된 날짜에서 하루 전으로 다음 루프 설정
-            oldest = min(data['output2'], key=lambda x: x['stck_bsop_date'])
-            current_end = datetime.strptime(oldest['stck_bsop_date'], "%Y%m%d") - timedelta(days=1)
-
-            if current_end < start_date:
-                break
-        data = {'output2': all_data}
+        params = {
+            "FID_COND_MRKT_DIV_CODE": market_code,
+            "FID_INPUT_ISCD": symbol,
+            "FID_PERIOD_DIV_CODE": "D"
+        }
+        # API 호출 (JSON 데이터 반환)
+        data = {'output2': fetch_kis_daily_pages(url, headers, params, start_date, end_date)}
     elif source == "osFutures":
         url = "https://openapi.koreainvestment.com:9443/uapi/overseas-futureoption/v1/quotations/daily-ccnl"
         headers = {
@@ -267,9 +287,7 @@ def fetch_stock_or_index_prices(symbol,token,category="index", source="domestic"
                 "INDEX_KEY": index_key
             }
 
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            data = response.json()
+            data = kis_get(url, headers, params)
 
             output2 = data.get("output2", [])
             if not output2:
@@ -350,55 +368,235 @@ def safe_int(val):
         return int(val)
     except (ValueError, TypeError):
         return 0
-def fetch_stock_info(symbol, token, category,source="krx", day_num=200, ma_period=100):
+def _pending_indicators(processed_time, rows, start, keep):
+    """지표 계산 전 결과: rows[start:]에 지표를 채운 뒤 앞에서 keep개만 남김 (keep=None이면 start 이후 전부)"""
+    return {'processed_time': processed_time, 'data': rows, 'indicator_start': start, 'keep': keep}
+
+def is_pending_indicators(entry):
+    return isinstance(entry, dict) and 'indicator_start' in entry
+
+def finish_indicators(entries, ma_period=100):
+    """
+    지표 계산 전 결과 묶음(한 카테고리 등)을 batch_indicators 한 번으로 계산 → 저장 형식으로 변환.
+    입력 순서대로 {'processed_time', 'data'} 리스트 반환
+    """
+    series = batch_indicators([[r["close"] for r in e['data']] for e in entries], ma_period)
+    out = []
+    for e, indicators in zip(entries, series):
+        rows = attach_indicators(e['data'], indicators, start=e['indicator_start'])
+        rows = rows[-e['keep']:] if e['keep'] is not None else rows[e['indicator_start']:]
+        out.append({'processed_time': e['processed_time'], 'data': rows})
+    return out
+
+def fetch_stock_info(symbol, token, category,source="krx", day_num=200, ma_period=100, cache=None, defer_indicators=False):
+    """defer_indicators=True면 지표 계산 전 결과 반환 (호출 측이 finish_indicators로 여러 종목을 한 번에 계산)"""
     processed_time = datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
     try:
 
-        data = fetch_stock_or_index_prices(symbol, token, category=category, source=source)
+        data = fetch_stock_or_index_prices(symbol, token, category=category, source=source, cache=cache)
     except ValueError as e:
         print(f"Error: {e}")
         data = None  # 또는 적절한 기본값
 
-    moving_avg = calculate_moving_average(data, period=ma_period)
-    upper10, lower10 = calculate_envelope(moving_avg, 0.10)
-    upper3, lower3 = calculate_envelope(moving_avg, 0.03)
+    # 이동평균 윈도우가 찬 이후(ma_period번째 봉부터)만 저장
+    pending = _pending_indicators(processed_time, data, ma_period, None)
+    return pending if defer_indicators else finish_indicators([pending], ma_period)[0]
+
+def sync_stock_info(symbol, token, category, source="krx", existing=None, day_num=200, ma_period=100, cache=None,
+                    defer_indicators=False):
+    """
+    chart_data에 저장된 기존 결과(existing)를 기준으로 증분 동기화.
+    - 마지막 저장 날짜부터만 KIS에 요청 (마지막 봉은 장중 값일 수 있으므로 다시 받아 덮어씀)
+    - 콜드 스타트(기존 데이터 없음/부족), 공백이 너무 긴 경우, 응답에 마지막 저장 봉이 없는 경우(갭)는
+      fetch_stock_info로 1년치 전체 조회
+    - defer_indicators: fetch_stock_info와 같음
+    """
+    rows = (existing or {}).get("data") or []
+    keep = day_num - ma_period
+    full_kwargs = dict(source=source, day_num=day_num, ma_period=ma_period, cache=cache, defer_indicators=defer_indicators)
+
+    if not CHART_INCREMENTAL_SYNC or len(rows) < ma_period:
+        return fetch_stock_info(symbol, token, category, **full_kwargs)
+
+    last_date = datetime.strptime(rows[-1]["date"], "%Y-%m-%d")
+    if (datetime.today() - last_date).days > CHART_SYNC_MAX_GAP_DAYS:
+        print(f"⚠️ {symbol} 마지막 저장일 {rows[-1]['date']} 이 너무 오래됨 → 전체 조회")
+        return fetch_stock_info(symbol, token, category, **full_kwargs)
 
-    trimmed_data = data[-len(moving_avg):]
-    for i in range(len(trimmed_data)):
-        trimmed_data[i]["ma100"] = moving_avg[i]
-        trimmed_data[i]["envelope10_upper"] = upper10[i]
-        trimmed_data[i]["envelope10_lower"] = lower10[i]
-        trimmed_data[i]["envelope3_upper"] = upper3[i]
-        trimmed_data[i]["envelope3_lower"] = lower3[i]
-    return {'processed_time': processed_time, 'data': trimmed_data}
+    processed_time = datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+    new_rows = fetch_stock_or_index_prices(symbol, token, category=category, source=source, start_date=last_date, cache=cache)
+    if not new_rows or new_rows[0]["date"] != rows[-1]["date"]:
+        # 겹치는 봉이 없으면 이어붙일 수 없음 → 전체 조회
+        print(f"⚠️ {symbol} 증분 응답에 마지막 저장 봉({rows[-1]['date']})이 없음 → 전체 조회")
+        return fetch_stock_info(symbol, token, category, **full_kwargs)
+
+    # 기존 봉(마지막 봉 제외) + 새 봉. 기존 봉의 지표는 그대로 두고 새 봉만 계산
+    merged = [dict(r) for r in rows[:-1]] + new_rows
+    pending = _pending_indicators(processed_time, merged, len(rows) - 1, keep)
+    return pending if defer_indicators else finish_indicators([pending], ma_period)[0]
 
 # 각 지표들의 평균 계산 (있는 경우에만)
 
-def calculate_dxy_from_currency_data(token, ma_period=100) -> list:
+# DXY 구성 통화 (currency 카테고리의 같은 심볼과 FetchCache로 조회 결과 공유)
+DXY_CURRENCY_SYMBOLS = {
+    "usd_jpy": "FX@JPY",  # 일본 엔
+    "usd_eur": "FX@EUR",  # 유로 유로->달러임
+    "usd_gbp": "FX@GBP",  # 영국 파운드 파운드->달러
+    "usd_cad": "FX@CAD",  # 캐나다 달러
+    "usd_sek": "FX@SEK",  # 스웨덴 크로나
+    "usd_chf": "FX@CHF",  # 스위스 프랑
+}
+
+DXY_WEIGHTS = {
+    'usd_eur': 0.576,
+    'usd_jpy': 0.136,
+    'usd_gbp': 0.119,
+    'usd_cad': 0.091,
+    'usd_sek': 0.042,
+    'usd_chf': 0.036
+}
+DXY_LOG_SCALE = math.log(50.14348112)
+DXY_STATE_NAME = "dxy"
+# incremental: 저장된 상태에 새 날짜만 추가 / full: 매번 1년치 재계산 / verify: 둘 다 계산해 비교(결과는 full)
+DXY_MODE = os.getenv("DXY_MODE", "incremental")
+
+def calculate_dxy_from_currency_data(token, ma_period=100, cache=None) -> list:
+    """
+    DXY = 50.14348112 × Π(환율^가중치) → 로그 공간에서 Σ 가중치×log(환율)로 계산.
+    상태(chart_state:dxy): 정렬된 날짜, 통화별 log 환율, log DXY, 이동평균, 이동합(window_sum)
+    - 매 실행 마지막 상태 날짜부터만 환율을 받아 새 날짜만 추가 (마지막 날짜는 장중 값일 수 있어 다시 계산)
+    - 상태가 없거나 오래됐거나 응답에 마지막 날짜가 없으면(갭) 1년치로 상태 재구성
+    """
     processed_time = datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    if DXY_MODE == "full":
+        return _calculate_dxy_pandas(token, ma_period, cache, processed_time)
+
+    state = None
+    try:
+        state = chart_store.load_state(DXY_STATE_NAME)
+    except Exception as e:
+        print(f"⚠️ DXY 상태 조회 실패, 전체 재계산: {e}")
+    if state and state.get("ma_period") != ma_period:
+        state = None
+
+    if state and state["dates"]:
+        last_date = datetime.strptime(state["dates"][-1], "%Y-%m-%d")
+        if (datetime.today() - last_date).days > CHART_SYNC_MAX_GAP_DAYS:
+            state = None
+        else:
+            dates, log_rates = _dxy_aligned_log_rates(token, cache, start_date=last_date)
+            if not dates or dates[0] != state["dates"][-1]:
+                print(f"⚠️ DXY 증분 응답에 마지막 날짜({state['dates'][-1]})가 없음 → 전체 재계산")
+                state = None
+            else:
+                _dxy_apply(state, dates, log_rates)
+    else:
+        state = None
+
+    if state is None:
+        state = _dxy_empty_state(ma_period)
+        dates, log_rates = _dxy_aligned_log_rates(token, cache)
+        _dxy_apply(state, dates, log_rates)
+
+    chart_store.save_state(DXY_STATE_NAME, state)
+    result = {'processed_time': processed_time, 'data': _dxy_rows(state)}
+
+    if DXY_MODE == "verify":
+        full = _calculate_dxy_pandas(token, ma_period, cache, processed_time)
+        _dxy_compare(result["data"], full["data"])
+        return full
+    return result
+
+def _dxy_empty_state(ma_period):
+    return {"ma_period": ma_period, "dates": [], "log_rates": {t: [] for t in DXY_WEIGHTS},
+            "log_dxy": [], "ma": [], "window_sum": 0.0}
+
+def _dxy_aligned_log_rates(token, cache, start_date=None):
+    """6개 통화가 모두 있는 날짜만 남긴 (날짜 리스트, {통화: log 환율 리스트})"""
+    by_ticker = {}
+    for ticker in DXY_WEIGHTS:
+        rows = fetch_stock_or_index_prices(DXY_CURRENCY_SYMBOLS[ticker], token, category='currency',
+                                           source='overseas', start_date=start_date, cache=cache)
+        by_ticker[ticker] = {r["date"]: math.log(r["close"]) for r in rows}
+    dates = sorted(set.intersection(*(set(v) for v in by_ticker.values())))
+    return dates, {t: [by_ticker[t][d] for d in dates] for t in DXY_WEIGHTS}
+
+def _dxy_pop(state):
+    """마지막 날짜 제거 (이동합도 한 칸 되돌림)"""
+    period = state["ma_period"]
+    state["dates"].pop()
+    for values in state["log_rates"].values():
+        values.pop()
+    state["ma"].pop()
+    close = math.exp(state["log_dxy"].pop())
+    state["window_sum"] -= close
+    if len(state["log_dxy"]) >= period:
+        state["window_sum"] += math.exp(state["log_dxy"][-period])
+
+def _dxy_push(state, date, log_rates):
+    period = state["ma_period"]
+    log_dxy = DXY_LOG_SCALE + sum(DXY_WEIGHTS[t] * log_rates[t] for t in DXY_WEIGHTS)
+    state["dates"].append(date)
+    for t in DXY_WEIGHTS:
+        state["log_rates"][t].append(log_rates[t])
+    state["log_dxy"].append(log_dxy)
+    state["window_sum"] += math.exp(log_dxy)
+    if len(state["log_dxy"]) > period:
+        state["window_sum"] -= math.exp(state["log_dxy"][-period - 1])
+    state["ma"].append(state["window_sum"] / period if len(state["log_dxy"]) >= period else None)
+
+def _dxy_apply(state, dates, log_rates):
+    """dates[0] 이후 기존 날짜는 되돌리고(재계산) 새 날짜들을 순서대로 추가"""
+    while state["dates"] and state["dates"][-1] >= dates[0]:
+        _dxy_pop(state)
+    for i, date in enumerate(dates):
+        _dxy_push(state, date, {t: log_rates[t][i] for t in DXY_WEIGHTS})
+
+    # 되돌리기(pop)에 필요한 만큼만 보관
+    extra = len(state["dates"]) - 2 * state["ma_period"]
+    if extra > 0:
+        state["dates"] = state["dates"][extra:]
+        state["log_dxy"] = state["log_dxy"][extra:]
+        state["ma"] = state["ma"][extra:]
+        state["log_rates"] = {t: v[extra:] for t, v in state["log_rates"].items()}
+
+def _dxy_rows(state, keep=100):
+    rows = []
+    for date, log_dxy, ma in zip(state["dates"][-keep:], state["log_dxy"][-keep:], state["ma"][-keep:]):
+        ma = float("nan") if ma is None else ma
+        row = {"date": date, "close": math.exp(log_dxy), MA_KEY: ma}
+        for name, pct in ENVELOPES.items():
+            row[f"{name}_upper"] = ma * (1 + pct)
+            row[f"{name}_lower"] = ma * (1 - pct)
+        rows.append(row)
+    return rows
+
+def _dxy_compare(incremental_rows, full_rows):
+    full_by_date = {r["date"]: r for r in full_rows}
+    worst = 0.0
+    for row in incremental_rows:
+        ref = full_by_date.get(row["date"])
+        if ref is None:
+            print(f"⚠️ DXY verify: {row['date']} 전체 재계산 결과에 없음")
+            continue
+        for k in ("close", MA_KEY):
+            if ref[k] == ref[k] and row[k] == row[k]:  # NaN 제외
+                worst = max(worst, abs(row[k] - ref[k]) / abs(ref[k]))
+    print(f"🔎 DXY verify: 증분 vs 전체 최대 상대오차 {worst:.3e} ({len(incremental_rows)}행)")
+    return worst
+
+def _calculate_dxy_pandas(token, ma_period, cache, processed_time):
+    """검증용 전체 재계산 (1년치 pandas 계산)"""
     required = ["usd_eur", "usd_jpy", "usd_gbp", "usd_cad", "usd_sek", "usd_chf"]
-    os_CURRENCY_SYMBOLS = {
-        "usd_jpy": "FX@JPY",  # 일본 엔
-        "usd_eur": "FX@EUR",  # 유로 유로->달러임
-        "usd_gbp": "FX@GBP",  # 영국 파운드 파운드->달러
-        "usd_cad": "FX@CAD",  # 캐나다 달러
-        "usd_sek": "FX@SEK",  # 스웨덴 크로나
-        "usd_chf": "FX@CHF",  # 스위스 프랑
-    }
+    weights = DXY_WEIGHTS
+    import pandas as pd  # 검증/전체 모드에서만 사용 → 매시간 경로에는 pandas 없음
 
-    weights = {
-        'usd_eur': 0.576,
-        'usd_jpy': 0.136,
-        'usd_gbp': 0.119,
-        'usd_cad': 0.091,
-        'usd_sek': 0.042,
-        'usd_chf': 0.036
-    }
     # DXY 구성 통화의 환율 데이터 불러오기
     currency_data = {}
     for ticker in required:
-        symbol = os_CURRENCY_SYMBOLS[ticker]
-        raw = fetch_stock_or_index_prices(symbol, token, category='currency', source='overseas')
+        symbol = DXY_CURRENCY_SYMBOLS[ticker]
+        raw = fetch_stock_or_index_prices(symbol, token, category='currency', source='overseas', cache=cache)
         df = pd.DataFrame(raw)
         df['date'] = pd.to_datetime(df['date'])
         df = df.sort_values('date')
@@ -422,12 +620,9 @@ def calculate_dxy_from_currency_data(token, ma_period=100) -> list:
     dxy_df = pd.DataFrame({
         'close': dxy
     })
-    dxy_df['ma100'] = dxy_df['close'].rolling(window=100).mean()
-    # 100일 이동 평균이 이미 있다면
-    dxy_df['envelope10_upper'] = dxy_df['ma100'] * 1.10
-    dxy_df['envelope10_lower'] = dxy_df['ma100'] * 0.90
-    dxy_df['envelope3_upper'] = dxy_df['ma100'] * 1.03
-    dxy_df['envelope3_lower'] = dxy_df['ma100'] * 0.97
+    # KIS 일봉과 같은 지표 구현 사용
+    for key, values in compute_indicators(dxy_df['close'].to_numpy(), ma_period).items():
+        dxy_df[key] = values
     recent_df = dxy_df.sort_index().tail(100)[[
         'close', 'ma100', 'envelope10_upper', 'envelope10_lower', 'envelope3_upper', 'envelope3_lower'
     ]].reset_index()